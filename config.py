@@ -2,14 +2,32 @@
 Configuración del Agente de Automatización SQL
 """
 import os
+import sys
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# CARGAR VARIABLES DE ENTORNO (.env)
-load_dotenv()
+# slots=True solo existe a partir de Python 3.10; en versiones anteriores se omite
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+@lru_cache(maxsize=1)
+def _load_env() -> Dict[str, str]:
+    """Lee el archivo .env una sola vez y lo combina con las variables del proceso
+    
+    Las variables del proceso tienen prioridad sobre el .env, igual que con load_dotenv().
+    """
+    file_values = {key: value for key, value in dotenv_values().items() if value is not None}
+    return {**file_values, **os.environ}
+
+# Valores de texto que se interpretan como verdadero
+_TRUTHY = frozenset(('true', '1', 'yes', 'on'))
+
+def _str_to_bool(s) -> bool:
+    """Convierte texto de variables de entorno a boolean"""
+    return s.lower() in _TRUTHY if isinstance(s, str) else bool(s)
+
+@dataclass(**_DATACLASS_OPTIONS)
 class DatabaseConfig:
     """Configuración de conexión a la base de datos"""
     host: str = "localhost"
@@ -18,20 +36,25 @@ class DatabaseConfig:
     password: str = ""
     database: str = "automation_db"
     charset: str = "utf8mb4"
+    pool_size: int = 10
+    pool_validation_interval: float = 5.0
     
     @classmethod
     def from_env(cls):
         """Carga configuración desde variables de entorno"""
+        env = _load_env()
         return cls(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=int(os.getenv("DB_PORT", "3306")),
-            username=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "automation_db"),
-            charset=os.getenv("DB_CHARSET", "utf8mb4")
+            host=env.get("DB_HOST", "localhost"),
+            port=int(env.get("DB_PORT", "3306")),
+            username=env.get("DB_USER", "root"),
+            password=env.get("DB_PASSWORD", ""),
+            database=env.get("DB_NAME", "automation_db"),
+            charset=env.get("DB_CHARSET", "utf8mb4"),
+            pool_size=int(env.get("DB_POOL_SIZE", "10")),
+            pool_validation_interval=float(env.get("DB_POOL_VALIDATION_INTERVAL", "5"))
         )
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class EmailConfig:
     """Configuración para notificaciones por email"""
     smtp_server: str = "smtp.gmail.com"
@@ -43,17 +66,18 @@ class EmailConfig:
     
     @classmethod
     def from_env(cls):
-        to_emails_str = os.getenv("EMAIL_TO", "")
+        env = _load_env()
+        to_emails_str = env.get("EMAIL_TO", "")
         return cls(
-            smtp_server=os.getenv("EMAIL_SMTP_SERVER", "smtp.gmail.com"),
-            smtp_port=int(os.getenv("EMAIL_SMTP_PORT", "587")),
-            username=os.getenv("EMAIL_USERNAME", ""),
-            password=os.getenv("EMAIL_PASSWORD", ""),
-            from_email=os.getenv("EMAIL_FROM", ""),
+            smtp_server=env.get("EMAIL_SMTP_SERVER", "smtp.gmail.com"),
+            smtp_port=int(env.get("EMAIL_SMTP_PORT", "587")),
+            username=env.get("EMAIL_USERNAME", ""),
+            password=env.get("EMAIL_PASSWORD", ""),
+            from_email=env.get("EMAIL_FROM", ""),
             to_emails=[e.strip() for e in to_emails_str.split(',')] if to_emails_str else []
         )
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class AutomationConfig:
     """Configuración general del agente"""
     # Configuración de reportes
@@ -65,6 +89,7 @@ class AutomationConfig:
     monitoring_enabled: bool = True
     monitoring_interval: int = 300
     alert_thresholds: Dict[str, float] = field(default_factory=dict)
+    alert_history_max: int = 10000
     
     # Configuración de backup
     backup_enabled: bool = True
@@ -80,40 +105,50 @@ class AutomationConfig:
     
     @classmethod
     def from_env(cls):
-        # Función auxiliar para convertir texto a boolean
-        def str_to_bool(s):
-            return str(s).lower() in ('true', '1', 'yes', 'on')
+        env = _load_env()
 
         config = cls(
-            reports_enabled=str_to_bool(os.getenv("REPORTS_ENABLED", "true")),
-            reports_schedule=os.getenv("REPORTS_SCHEDULE", "daily"),
-            reports_output_dir=os.getenv("REPORTS_OUTPUT_DIR", "reports"),
+            reports_enabled=_str_to_bool(env.get("REPORTS_ENABLED", "true")),
+            reports_schedule=env.get("REPORTS_SCHEDULE", "daily"),
+            reports_output_dir=env.get("REPORTS_OUTPUT_DIR", "reports"),
             
-            monitoring_enabled=str_to_bool(os.getenv("MONITORING_ENABLED", "true")),
-            monitoring_interval=int(os.getenv("MONITORING_INTERVAL", "300")),
+            monitoring_enabled=_str_to_bool(env.get("MONITORING_ENABLED", "true")),
+            monitoring_interval=int(env.get("MONITORING_INTERVAL", "300")),
+            alert_history_max=int(env.get("ALERT_HISTORY_MAX", "10000")),
             
-            backup_enabled=str_to_bool(os.getenv("BACKUP_ENABLED", "true")),
-            backup_schedule=os.getenv("BACKUP_SCHEDULE", "daily"),
-            backup_retention_days=int(os.getenv("BACKUP_RETENTION_DAYS", "30")),
-            backup_dir=os.getenv("BACKUP_DIR", "backups"),
+            backup_enabled=_str_to_bool(env.get("BACKUP_ENABLED", "true")),
+            backup_schedule=env.get("BACKUP_SCHEDULE", "daily"),
+            backup_retention_days=int(env.get("BACKUP_RETENTION_DAYS", "30")),
+            backup_dir=env.get("BACKUP_DIR", "backups"),
             
-            log_level=os.getenv("LOG_LEVEL", "INFO"),
-            log_file=os.getenv("LOG_FILE", "logs/sql_agent.log"),
-            log_max_size=int(os.getenv("LOG_MAX_SIZE", "10485760")),
-            log_backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5"))
+            log_level=env.get("LOG_LEVEL", "INFO"),
+            log_file=env.get("LOG_FILE", "logs/sql_agent.log"),
+            log_max_size=int(env.get("LOG_MAX_SIZE", "10485760")),
+            log_backup_count=int(env.get("LOG_BACKUP_COUNT", "5"))
         )
         
         # Cargar umbrales de alertas
         config.alert_thresholds = {
-            'connection_count': int(os.getenv("ALERT_CONNECTION_COUNT", "100")),
-            'cpu_usage': float(os.getenv("ALERT_CPU_USAGE", "80.0")),
-            'memory_usage': float(os.getenv("ALERT_MEMORY_USAGE", "85.0")),
-            'disk_usage': float(os.getenv("ALERT_DISK_USAGE", "90.0")),
+            'connection_count': int(env.get("ALERT_CONNECTION_COUNT", "100")),
+            'cpu_usage': float(env.get("ALERT_CPU_USAGE", "80.0")),
+            'memory_usage': float(env.get("ALERT_MEMORY_USAGE", "85.0")),
+            'disk_usage': float(env.get("ALERT_DISK_USAGE", "90.0")),
             'slow_queries_count': 10  # Valor por defecto
         }
         return config
 
-# Instancias globales que usará el resto del programa
-db_config = DatabaseConfig.from_env()
-email_config = EmailConfig.from_env()
-automation_config = AutomationConfig.from_env()
\ No newline at end of file
+# Instancias globales que usará el resto del programa.
+# Se construyen de forma perezosa (PEP 562) la primera vez que se accede a ellas.
+_LAZY_CONFIGS = {
+    'db_config': DatabaseConfig,
+    'email_config': EmailConfig,
+    'automation_config': AutomationConfig,
+}
+
+def __getattr__(name):
+    config_cls = _LAZY_CONFIGS.get(name)
+    if config_cls is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    instance = config_cls.from_env()
+    globals()[name] = instance
+    return instance
\ No newline at end of file
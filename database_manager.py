@@ -2,34 +2,256 @@
 Gestor de Base de Datos para el Agente de Automatización SQL
 """
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+from mysql.connector.errors import InterfaceError, OperationalError
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from contextlib import contextmanager
-import pandas as pd
-from datetime import datetime, timedelta
-import json
+from functools import lru_cache
+from datetime import datetime
+import gzip
+import hashlib
 import os
+import re
 import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import weakref
 
-from config import db_config
+from config import db_config, automation_config
+
+# Métricas de estado y la variable global de MySQL de la que provienen
+_STATUS_METRICS = {
+    'connection_count': 'Threads_connected',
+    'uptime': 'Uptime',
+    'queries_per_second': 'Queries',
+    'slow_queries': 'Slow_queries',
+    'table_locks': 'Table_locks_waited',
+}
+
+_INNODB_BUFFER_POOL_VARIABLES = (
+    'Innodb_buffer_pool_pages_total',
+    'Innodb_buffer_pool_pages_free',
+    'Innodb_buffer_pool_pages_dirty',
+)
+
+_GLOBAL_STATUS_QUERY = "SHOW GLOBAL STATUS WHERE Variable_name IN ({})".format(
+    ', '.join(f"'{name}'" for name in (*_STATUS_METRICS.values(), *_INNODB_BUFFER_POOL_VARIABLES))
+)
+
+_DATABASE_SIZE_QUERY = """
+    SELECT 
+        ROUND(SUM(data_length + index_length) / 1024 / 1024, 2) AS size_mb
+    FROM information_schema.tables 
+    WHERE table_schema = %s
+"""
+
+_SLOW_QUERIES_QUERY = """
+    SELECT 
+        sql_text,
+        exec_count,
+        avg_timer_wait/1000000000 as avg_time_seconds,
+        sum_timer_wait/1000000000 as total_time_seconds,
+        sum_rows_examined,
+        sum_rows_sent,
+        first_seen,
+        last_seen
+    FROM performance_schema.events_statements_summary_by_digest 
+    WHERE schema_name = %s
+    ORDER BY avg_timer_wait DESC 
+    LIMIT %s
+"""
+
+_SERVER_INFO_QUERY = """
+    SELECT 
+        VERSION() AS version,
+        @@hostname AS hostname,
+        (SELECT COUNT(*) FROM information_schema.tables 
+         WHERE table_schema = DATABASE()) AS table_count
+"""
+
+# INSERT/REPLACE ... VALUES (...) [ON DUPLICATE KEY UPDATE ...] reescribible como INSERT extendido
+_INSERT_VALUES_RE = re.compile(
+    r'^(?P<prefix>\s*(?:INSERT|REPLACE)\b.*?\bVALUES\s*)'
+    r'(?P<row>\(.*?\))'
+    r'(?P<suffix>\s*(?:ON\s+DUPLICATE\s+KEY\s+UPDATE\b.*?)?)\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Filas por sentencia en los INSERT extendidos (limita el tamaño del paquete)
+_BATCH_CHUNK_SIZE = 1000
+
+# Filas por bloque al leer resultados grandes con un cursor sin buffer
+_FETCH_CHUNK_SIZE = 10000
+
+# Tamaño de buffer para copiar la salida de mysqldump al comprimirla (1 MiB)
+_BACKUP_BUFFER_SIZE = 1 << 20
+
+# Nivel de compresión gzip de los backups (equilibrio entre velocidad y tamaño)
+_BACKUP_COMPRESSLEVEL = 3
+
+# Definición de las tablas de resumen (mv_*) y de su marca de actualización (mv_refresh_log)
+_MV_DDL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'materialized_views.sql')
+
+_MV_WATERMARK_QUERY = "SELECT NOW(), (SELECT last_refresh FROM mv_refresh_log WHERE view_name = %s)"
+
+_MV_WATERMARK_UPDATE = "REPLACE INTO mv_refresh_log (view_name, last_refresh) VALUES (%s, %s)"
+
+_MV_EPOCH = datetime(1970, 1, 1)
+
+# Funciones cuyo resultado depende del momento de ejecución
+_TIME_FUNCTIONS_RE = re.compile(
+    r'\b(?:NOW|CURDATE|CURTIME|SYSDATE|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP)\b',
+    re.IGNORECASE
+)
+
+# Marcadores de parámetros con nombre: %(nombre)s
+_NAMED_PARAM_RE = re.compile(r'%\((\w+)\)s')
+
+# Errores tras los que una sentencia preparada se vuelve a preparar: conexión o sesión
+# perdidas y manejador de sentencia desconocido para el servidor
+_PREPARED_RETRY_ERRORS = (OperationalError, InterfaceError)
+_PREPARED_RETRY_ERRNOS = frozenset((errorcode.ER_UNKNOWN_STMT_HANDLER,))
+
+# Entradas máximas en la caché de resultados
+_CACHE_MAX_ENTRIES = 128
+
+# Último timestamp formateado: [segundo epoch, texto ISO]
+_timestamp_cache = [0, '']
+
+def _current_timestamp() -> str:
+    """Devuelve la hora actual en ISO con precisión de segundos, reutilizando el texto dentro del mismo segundo"""
+    second = int(time.time())
+    if second != _timestamp_cache[0]:
+        _timestamp_cache[:] = [second, datetime.fromtimestamp(second).isoformat()]
+    return _timestamp_cache[1]
+
+def _statement_digest(query: str) -> bytes:
+    """Huella compacta del texto SQL, usada como clave de cachés"""
+    return hashlib.blake2b(query.encode('utf-8'), digest_size=16).digest()
+
+@lru_cache(maxsize=_CACHE_MAX_ENTRIES)
+def _compile_named(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """Plantilla posicional de una consulta con marcadores %(nombre)s y el orden de los nombres
+    
+    Se calcula una vez por texto SQL: las ejecuciones siguientes solo ordenan los
+    valores, y el texto resultante es siempre el mismo (misma sentencia preparada).
+    """
+    return _NAMED_PARAM_RE.sub('%s', query), tuple(_NAMED_PARAM_RE.findall(query))
+
+def _to_positional(query: str, params: Any) -> Tuple[str, Tuple]:
+    """Convierte marcadores %(nombre)s en %s con los valores en orden de aparición"""
+    if not isinstance(params, dict):
+        return query, tuple(params or ())
+    
+    statement, names = _compile_named(query)
+    return statement, tuple(params[name] for name in names)
+
+@lru_cache(maxsize=1)
+def _load_mv_ddl() -> Tuple[str, ...]:
+    """Sentencias CREATE TABLE IF NOT EXISTS de sql/materialized_views.sql (leídas una vez)"""
+    with open(_MV_DDL_PATH, encoding='utf-8') as f:
+        script = '\n'.join(line for line in f if not line.lstrip().startswith('--'))
+    return tuple(statement.strip() for statement in script.split(';') if statement.strip())
+
+def _install_validation_interval(cnx, interval: float):
+    """Hace que is_connected() de una conexión física omita el ping si se usó hace poco
+    
+    El pool de mysql-connector valida cada conexión con is_connected() (un COM_PING)
+    en cada checkout. Si la conexión terminó su último uso sin errores hace menos de
+    interval segundos se da por válida sin ir al servidor.
+    
+    Depende de un detalle interno del conector: MySQLConnectionPool.get_connection()
+    llama a cnx.is_connected() sobre la conexión física y, si devuelve False, la
+    reconecta. Por eso basta con sustituir el método en la instancia; si una versión
+    futura del conector dejara de llamarlo, solo se perdería el ahorro del ping.
+    """
+    ping = cnx.is_connected
+    cnx._validated_at = None
+    
+    def is_connected():
+        validated_at = cnx._validated_at
+        if validated_at is not None and time.monotonic() - validated_at < interval:
+            return True
+        return ping()
+    
+    cnx.is_connected = is_connected
+
+def _quote_identifier(name: str) -> str:
+    """Escapa un identificador de MySQL (tabla/esquema) con comillas invertidas"""
+    return "`" + name.replace("`", "``") + "`"
 
 class DatabaseManager:
     """Gestor principal para operaciones de base de datos"""
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, pool_size: Optional[int] = None):
         self.config = config or db_config
+        # El pool abre todas sus conexiones al crearse: ajustarlo a la carga real
+        self.pool_size = pool_size or self.config.pool_size
         self.logger = logging.getLogger(__name__)
         self._connection_pool = None
+        self._mysqldump_path: Optional[str] = None
+        
+        # Resultado de la última prueba de conexión (None si aún no se ha probado)
+        self.is_healthy: Optional[bool] = None
+        self.server_info: Optional[Dict[str, Any]] = None
         
+        # Cursores preparados reutilizables por conexión física y texto de consulta
+        self._prepared_cursors = weakref.WeakKeyDictionary()
+        
+        # Caché con expiración para consultas de metadatos y métricas
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._cache_lock = threading.Lock()
+        self._cache_ttl = max(automation_config.monitoring_interval // 2, 1)
+        
+    def _cache_get(self, key: Tuple) -> Optional[Any]:
+        """Devuelve un valor cacheado si aún no ha expirado"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self._cache.pop(key, None)
+            return None
+        return value
+    
+    def _cache_set(self, key: Tuple, value: Any, ttl: Optional[float] = None):
+        """Guarda un valor en caché durante el TTL indicado (o el configurado)"""
+        now = time.monotonic()
+        # Las consultas de un reporte pueden guardar resultados desde varios hilos
+        with self._cache_lock:
+            if key not in self._cache and len(self._cache) >= _CACHE_MAX_ENTRIES:
+                # Descartar primero las entradas caducadas y, si no basta, la más antigua
+                for old_key in [k for k, (expires_at, _) in self._cache.items() if expires_at <= now]:
+                    del self._cache[old_key]
+                if len(self._cache) >= _CACHE_MAX_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
+            self._cache[key] = (now + (self._cache_ttl if ttl is None else ttl), value)
+    
+    def _query_cache_key(self, query: str, params: Any = None) -> Tuple:
+        """Clave de caché para una consulta: hash del SQL, parámetros y minuto actual si usa NOW()"""
+        digest = _statement_digest(query)
+        # Con NOW()/CURDATE() el resultado cambia con el tiempo: la clave cambia cada minuto
+        bucket = int(time.time() // 60) if _TIME_FUNCTIONS_RE.search(query) else 0
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        return ('query', digest, tuple(params or ()), bucket)
+    
+    def clear_cache(self):
+        """Invalida todos los resultados cacheados"""
+        self._cache.clear()
+    
     def _create_connection_pool(self):
         """Crea un pool de conexiones para mejor rendimiento"""
         try:
             pool_config = {
                 'pool_name': 'sql_agent_pool',
-                'pool_size': 10,
-                'pool_reset_session': True,
+                'pool_size': self.pool_size,
+                # Sin COM_RESET_CONNECTION en cada checkout: el agente no modifica variables
+                # de sesión y usa autocommit, y así se conservan las sentencias preparadas
+                'pool_reset_session': False,
                 'host': self.config.host,
                 'port': self.config.port,
                 'user': self.config.username,
@@ -51,29 +273,69 @@ class DatabaseManager:
             self._create_connection_pool()
         
         connection = None
+        cnx = None
+        completed = False
         try:
             connection = self._connection_pool.get_connection()
+            cnx = getattr(connection, '_cnx', connection)
+            if self.config.pool_validation_interval > 0 and not hasattr(cnx, '_validated_at'):
+                _install_validation_interval(cnx, self.config.pool_validation_interval)
             yield connection
+            completed = True
         except Error as e:
             self.logger.error(f"Error en conexión a base de datos: {e}")
             raise
         finally:
-            if connection and connection.is_connected():
-                connection.close()
+            # Solo un uso terminado con normalidad evita el ping: tras cualquier otra
+            # salida (error, GeneratorExit, KeyboardInterrupt...) se vuelve a validar
+            if hasattr(cnx, '_validated_at'):
+                cnx._validated_at = time.monotonic() if completed else None
+            # close() devuelve la conexión al pool; evitar is_connected() que hace un ping
+            if connection is not None:
+                try:
+                    connection.close()
+                except Error as e:
+                    self.logger.warning(f"Error devolviendo conexión al pool: {e}")
     
-    def execute_query(self, query: str, params: Tuple = None, fetch: bool = True) -> Optional[List[Dict]]:
-        """Ejecuta una consulta SQL y retorna los resultados"""
+    def execute_query(self, query: str, params: Tuple = None, fetch: bool = True,
+                      cursor_kwargs: Optional[Dict[str, Any]] = None,
+                      cache_ttl: Optional[float] = None,
+                      prepared: bool = False) -> Optional[List[Dict]]:
+        """Ejecuta una consulta SQL y retorna los resultados
+        
+        Por defecto usa un cursor simple (sin buffer) y construye los diccionarios
+        a partir de cursor.column_names; cursor_kwargs permite pedir otro tipo de
+        cursor (por ejemplo buffered=True). Con cache_ttl (segundos) las lecturas
+        repetidas se sirven desde memoria hasta que caduque el resultado, y con
+        prepared=True la lectura reutiliza una sentencia preparada del servidor.
+        """
+        cache_key = None
+        if fetch and cache_ttl:
+            cache_key = self._query_cache_key(query, params)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return list(cached)
+        
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor(dictionary=True, buffered=True)
-                cursor.execute(query, params or ())
-                
                 if fetch:
-                    results = cursor.fetchall()
-                    cursor.close()
-                    return results
+                    if prepared:
+                        rows = self._fetch_prepared(conn, query, params)
+                    else:
+                        cursor = conn.cursor(**(cursor_kwargs or {}))
+                        rows = self._fetch_dicts(cursor, query, params)
+                        cursor.close()
+                    if cache_key is not None:
+                        self._cache_set(cache_key, rows, cache_ttl)
+                        return list(rows)
+                    return rows
                 else:
-                    conn.commit()
+                    cursor = conn.cursor(**(cursor_kwargs or {}))
+                    cursor.execute(query, params or ())
+                    # Consumir resultados pendientes (p. ej. OPTIMIZE TABLE) antes de cerrar
+                    if cursor.with_rows:
+                        cursor.fetchall()
+                    # El pool usa autocommit, no hace falta un COMMIT adicional
                     cursor.close()
                     return None
                     
@@ -82,13 +344,183 @@ class DatabaseManager:
             self.logger.error(f"Query: {query}")
             raise
     
+    def iter_query_chunks(self, query: str, params: Tuple = None,
+                          chunk_size: int = _FETCH_CHUNK_SIZE):
+        """Lee el resultado de una consulta por bloques sin cargarlo entero en memoria
+        
+        Usa un cursor sin buffer (el servidor envía las filas a medida que se leen)
+        y produce tuplas (columnas, filas) de hasta chunk_size filas cada una.
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params or ())
+                    columns = list(cursor.column_names)
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield columns, rows
+                finally:
+                    # Si el consumidor se detiene antes, descartar las filas pendientes
+                    # para devolver la conexión limpia al pool
+                    if conn.unread_result:
+                        conn.consume_results()
+                    cursor.close()
+        except Error as e:
+            self.logger.error(f"Error leyendo consulta por bloques: {e}")
+            self.logger.error(f"Query: {query}")
+            raise
+    
+    def _iter_statement_results(self, cursor, script: str, params: Tuple = ()):
+        """Itera los resultados de un script multi-sentencia, uno por sentencia"""
+        # mysql-connector 8.x devuelve un iterador con multi=True; 9.x usa nextset()
+        try:
+            results = cursor.execute(script, params, multi=True)
+        except TypeError:
+            results = None
+        
+        if results is not None:
+            yield from results
+            return
+        
+        cursor.execute(script, params)
+        while True:
+            yield cursor
+            if not cursor.nextset():
+                break
+    
+    def execute_multi(self, queries: Dict[str, Any],
+                      cache_ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Ejecuta varias consultas de lectura en un solo viaje al servidor
+        
+        Cada consulta puede ser el texto SQL o una tupla (sql, parámetros), con
+        parámetros posicionales o con nombre. Devuelve {nombre: filas} en el orden
+        de queries; una consulta fallida queda como {nombre: excepción}. El servidor
+        detiene el lote en el primer error, así que las consultas siguientes se
+        reenvían en un nuevo lote. Con cache_ttl solo se envían las consultas sin
+        resultado vigente en caché.
+        """
+        results: Dict[str, Any] = dict.fromkeys(queries)
+        pending = []
+        for name, query in queries.items():
+            query, params = query if isinstance(query, tuple) else (query, None)
+            # Los parámetros se asocian por consulta: uno que falte o con forma
+            # incorrecta solo invalida esa consulta, no el lote entero
+            try:
+                statement, values = _to_positional(query.strip().rstrip(';'), params)
+                cache_key = self._query_cache_key(query, params) if cache_ttl else None
+            except (KeyError, TypeError) as e:
+                self.logger.error(f"Parámetros no válidos en la consulta {name}: {e!r}")
+                results[name] = e
+                continue
+            cached = self._cache_get(cache_key) if cache_ttl else None
+            if cached is not None:
+                results[name] = list(cached)
+            else:
+                pending.append((name, statement, values, cache_key))
+        
+        while pending:
+            # Un único script con marcadores posicionales: los valores se concatenan en orden
+            statements, script_params = [], []
+            for _, statement, values, _ in pending:
+                statements.append(statement)
+                script_params.extend(values)
+            # Separador en su propia línea por si una consulta termina en comentario
+            script = "\n;\n".join(statements)
+            done = 0
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        for result in self._iter_statement_results(cursor, script, tuple(script_params)):
+                            name = pending[done][0]
+                            if result.with_rows:
+                                columns = result.column_names
+                                results[name] = [dict(zip(columns, row)) for row in result.fetchall()]
+                            else:
+                                results[name] = []
+                            if cache_ttl:
+                                self._cache_set(pending[done][3], results[name], cache_ttl)
+                                results[name] = list(results[name])
+                            done += 1
+                    finally:
+                        cursor.close()
+            except Error as e:
+                if done == len(pending):
+                    break
+                name = pending[done][0]
+                self.logger.error(f"Error ejecutando consulta {name}: {e}")
+                results[name] = e
+                done += 1
+            
+            pending = pending[done:]
+        
+        return results
+    
+    def _prepared_cursor(self, conn, query: str):
+        """Devuelve el cursor preparado de la conexión para la consulta, creándolo si no existe"""
+        # La conexión física detrás del PooledMySQLConnection sobrevive entre checkouts
+        cnx = getattr(conn, '_cnx', conn)
+        cursors = self._prepared_cursors.get(cnx)
+        if cursors is None:
+            cursors = self._prepared_cursors[cnx] = {}
+        key = _statement_digest(query)
+        cursor = cursors.get(key)
+        if cursor is None:
+            cursor = cursors[key] = conn.cursor(prepared=True)
+        return cursor
+    
+    def _fetch_prepared(self, conn, query: str, params: Tuple) -> List[Dict]:
+        """Ejecuta una consulta parametrizada reutilizando su sentencia preparada"""
+        # Las sentencias preparadas solo admiten marcadores posicionales
+        query, params = _to_positional(query, params)
+        try:
+            return self._fetch_dicts(self._prepared_cursor(conn, query), query, params)
+        except Error as e:
+            # Los errores de la propia consulta (sintaxis, datos...) no se reintentan
+            if not (isinstance(e, _PREPARED_RETRY_ERRORS) or e.errno in _PREPARED_RETRY_ERRNOS):
+                raise
+            # La sentencia pudo invalidarse (p. ej. reinicio de sesión): preparar de nuevo una vez
+            cursors = self._prepared_cursors.get(getattr(conn, '_cnx', conn), {})
+            cursors.pop(_statement_digest(query), None)
+            return self._fetch_dicts(self._prepared_cursor(conn, query), query, params)
+    
+    def execute_prepared(self, query: str, params: Tuple) -> List[Dict]:
+        """Ejecuta una consulta de lectura como sentencia preparada del lado del servidor
+        
+        Pensado para consultas frecuentes (métricas, information_schema): el servidor
+        reutiliza el análisis y el plan en cada ejecución sobre la misma conexión.
+        """
+        try:
+            with self.get_connection() as conn:
+                return self._fetch_prepared(conn, query, params)
+        except Error as e:
+            self.logger.error(f"Error ejecutando consulta preparada: {e}")
+            self.logger.error(f"Query: {query}")
+            raise
+    
     def execute_batch(self, query: str, data: List[Tuple]) -> bool:
-        """Ejecuta una consulta en lote para múltiples registros"""
+        """Ejecuta una consulta en lote para múltiples registros
+        
+        Los INSERT/REPLACE ... VALUES (...) se reescriben como un INSERT extendido
+        (varias filas por sentencia) para enviar cada bloque en un solo viaje.
+        """
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor(buffered=True)
-                cursor.executemany(query, data)
-                conn.commit()
+                cursor = conn.cursor()
+                match = _INSERT_VALUES_RE.match(query)
+                
+                if match and data and isinstance(data[0], (tuple, list)):
+                    prefix, row, suffix = match.group('prefix', 'row', 'suffix')
+                    for start in range(0, len(data), _BATCH_CHUNK_SIZE):
+                        chunk = data[start:start + _BATCH_CHUNK_SIZE]
+                        statement = prefix + ", ".join([row] * len(chunk)) + suffix
+                        cursor.execute(statement, [value for record in chunk for value in record])
+                else:
+                    cursor.executemany(query, data)
+                
                 cursor.close()
                 return True
         except Error as e:
@@ -97,120 +529,264 @@ class DatabaseManager:
     
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Obtiene información detallada de una tabla"""
+        cache_key = ('table_info', table_name)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        quoted_table = _quote_identifier(table_name)
         queries = {
-            'columns': f"DESCRIBE {table_name}",
-            'row_count': f"SELECT COUNT(*) as count FROM {table_name}",
-            'size': f"""
+            'columns': (f"DESCRIBE {quoted_table}", None),
+            'row_count': (f"SELECT COUNT(*) as count FROM {quoted_table}", None),
+            'size': ("""
                 SELECT 
                     table_name,
                     ROUND(((data_length + index_length) / 1024 / 1024), 2) AS size_mb
                 FROM information_schema.tables 
-                WHERE table_schema = '{self.config.database}' 
-                AND table_name = '{table_name}'
-            """
+                WHERE table_schema = %s 
+                AND table_name = %s
+            """, (self.config.database, table_name))
         }
         
         result = {}
-        for key, query in queries.items():
+        for key, (query, params) in queries.items():
             try:
-                result[key] = self.execute_query(query)
+                if params:
+                    result[key] = self.execute_prepared(query, params)
+                else:
+                    result[key] = self.execute_query(query)
             except Error as e:
                 self.logger.warning(f"No se pudo obtener {key} para tabla {table_name}: {e}")
                 result[key] = None
         
-        return result
+        self._cache_set(cache_key, result)
+        return dict(result)
     
-    def get_database_metrics(self) -> Dict[str, Any]:
-        """Obtiene métricas importantes de la base de datos"""
-        metrics_queries = {
-            'connection_count': "SHOW STATUS LIKE 'Threads_connected'",
-            'uptime': "SHOW STATUS LIKE 'Uptime'",
-            'queries_per_second': "SHOW STATUS LIKE 'Queries'",
-            'slow_queries': "SHOW STATUS LIKE 'Slow_queries'",
-            'table_locks': "SHOW STATUS LIKE 'Table_locks_waited'",
-            'innodb_buffer_pool': """
-                SELECT 
-                    VARIABLE_NAME, 
-                    VARIABLE_VALUE 
-                FROM performance_schema.global_status 
-                WHERE VARIABLE_NAME IN (
-                    'Innodb_buffer_pool_pages_total',
-                    'Innodb_buffer_pool_pages_free',
-                    'Innodb_buffer_pool_pages_dirty'
-                )
-            """,
-            'database_size': f"""
-                SELECT 
-                    ROUND(SUM(data_length + index_length) / 1024 / 1024, 2) AS size_mb
-                FROM information_schema.tables 
-                WHERE table_schema = '{self.config.database}'
-            """
-        }
-        
+    def _fetch_dicts(self, cursor, query: str, params: Tuple = None) -> List[Dict]:
+        """Ejecuta una consulta con el cursor dado y devuelve las filas como diccionarios"""
+        cursor.execute(query, params or ())
+        rows = cursor.fetchall()
+        if rows and not isinstance(rows[0], dict):
+            columns = cursor.column_names
+            rows = [dict(zip(columns, row)) for row in rows]
+        return rows
+    
+    def _build_metrics(self, status: Optional[Dict[str, Any]],
+                       database_size: Optional[List[Dict]]) -> Dict[str, Any]:
+        """Construye el diccionario de métricas a partir de las variables de estado"""
         metrics = {}
-        for metric_name, query in metrics_queries.items():
-            try:
-                result = self.execute_query(query)
-                metrics[metric_name] = result
-            except Error as e:
-                self.logger.warning(f"No se pudo obtener métrica {metric_name}: {e}")
+        
+        for metric_name, variable_name in _STATUS_METRICS.items():
+            if status is not None and variable_name in status:
+                metrics[metric_name] = [{'Variable_name': variable_name, 'Value': status[variable_name]}]
+            else:
                 metrics[metric_name] = None
         
+        metrics['innodb_buffer_pool'] = [
+            {'VARIABLE_NAME': name, 'VARIABLE_VALUE': status[name]}
+            for name in _INNODB_BUFFER_POOL_VARIABLES if name in status
+        ] if status is not None else None
+        
+        metrics['database_size'] = database_size
+        
         # Agregar timestamp
-        metrics['timestamp'] = datetime.now().isoformat()
+        metrics['timestamp'] = _current_timestamp()
         return metrics
     
-    def get_slow_queries(self, limit: int = 10) -> List[Dict]:
-        """Obtiene las consultas más lentas del log de consultas lentas"""
-        query = """
-            SELECT 
-                sql_text,
-                exec_count,
-                avg_timer_wait/1000000000 as avg_time_seconds,
-                sum_timer_wait/1000000000 as total_time_seconds,
-                sum_rows_examined,
-                sum_rows_sent,
-                first_seen,
-                last_seen
-            FROM performance_schema.events_statements_summary_by_digest 
-            WHERE schema_name = %s
-            ORDER BY avg_timer_wait DESC 
-            LIMIT %s
+    def _fetch_status_and_size(self, conn, cursor) -> Tuple[Optional[Dict[str, Any]], Optional[List[Dict]]]:
+        """Lee las variables de estado globales y el tamaño de la base de datos
+        
+        Cada parte que falle se registra y se devuelve como None.
         """
+        status = None
+        database_size = None
+        
+        try:
+            rows = self._fetch_dicts(cursor, _GLOBAL_STATUS_QUERY)
+            status = {row['Variable_name']: row['Value'] for row in rows}
+        except Error as e:
+            self.logger.warning(f"No se pudieron obtener variables de estado: {e}")
+        
+        try:
+            database_size = self._fetch_prepared(conn, _DATABASE_SIZE_QUERY, (self.config.database,))
+        except Error as e:
+            self.logger.warning(f"No se pudo obtener métrica database_size: {e}")
         
+        return status, database_size
+    
+    def get_database_metrics(self) -> Dict[str, Any]:
+        """Obtiene métricas importantes de la base de datos"""
+        cached = self._cache_get(('database_metrics',))
+        if cached is not None:
+            # El timestamp corresponde al momento en que se obtuvieron las métricas
+            return dict(cached)
+        
+        # Variables de estado (una sola consulta) y tamaño con la misma conexión
+        status = None
+        database_size = None
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    status, database_size = self._fetch_status_and_size(conn, cursor)
+                finally:
+                    cursor.close()
+        except Error as e:
+            self.logger.warning(f"No se pudieron obtener métricas de la base de datos: {e}")
+        
+        metrics = self._build_metrics(status, database_size)
+        # Las métricas vacías de un fallo no se guardan: el siguiente intento vuelve a consultar
+        if status is not None:
+            self._cache_set(('database_metrics',), metrics)
+        return dict(metrics)
+    
+    def get_slow_queries(self, limit: int = 10) -> List[Dict]:
+        """Obtiene las consultas más lentas del log de consultas lentas"""
         try:
-            return self.execute_query(query, (self.config.database, limit))
+            return self.execute_prepared(_SLOW_QUERIES_QUERY, (self.config.database, limit))
         except Error as e:
             self.logger.warning(f"No se pudieron obtener consultas lentas: {e}")
             return []
     
+    def collect_monitoring_snapshot(self, slow_queries_limit: int = 10) -> Dict[str, Any]:
+        """Obtiene métricas y consultas lentas usando una sola conexión del pool
+        
+        Retorna un diccionario con las claves 'metrics' (mismo formato que
+        get_database_metrics) y 'slow_queries' (mismo formato que get_slow_queries).
+        """
+        status = None
+        database_size = None
+        slow_queries = []
+        
+        # Sin conexión (servidor caído o pool agotado) se devuelven métricas vacías,
+        # igual que get_database_metrics y get_slow_queries
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    status, database_size = self._fetch_status_and_size(conn, cursor)
+                    
+                    try:
+                        slow_queries = self._fetch_prepared(
+                            conn, _SLOW_QUERIES_QUERY, (self.config.database, slow_queries_limit)
+                        )
+                    except Error as e:
+                        self.logger.warning(f"No se pudieron obtener consultas lentas: {e}")
+                finally:
+                    cursor.close()
+        except Error as e:
+            self.logger.warning(f"No se pudieron obtener métricas de la base de datos: {e}")
+        
+        metrics = self._build_metrics(status, database_size)
+        if status is not None:
+            self._cache_set(('database_metrics',), metrics)
+        
+        return {
+            'metrics': dict(metrics),
+            'slow_queries': slow_queries
+        }
+    
     def optimize_tables(self) -> Dict[str, bool]:
         """Optimiza todas las tablas de la base de datos"""
         # Obtener lista de tablas
-        tables_query = f"""
-            SELECT table_name 
+        tables_query = """
+            SELECT table_name AS table_name 
             FROM information_schema.tables 
-            WHERE table_schema = '{self.config.database}' 
+            WHERE table_schema = %s 
             AND table_type = 'BASE TABLE'
         """
         
-        tables = self.execute_query(tables_query)
         results = {}
         
-        for table in tables:
-            table_name = table['table_name']
+        # Una sola conexión y cursor para todo el recorrido de tablas
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             try:
-                self.execute_query(f"OPTIMIZE TABLE {table_name}", fetch=False)
-                results[table_name] = True
-                self.logger.info(f"Tabla {table_name} optimizada exitosamente")
-            except Error as e:
-                results[table_name] = False
-                self.logger.error(f"Error optimizando tabla {table_name}: {e}")
+                cursor.execute(tables_query, (self.config.database,))
+                table_names = [row[0] for row in cursor.fetchall()]
+                
+                for table_name in table_names:
+                    try:
+                        cursor.execute(f"OPTIMIZE TABLE {_quote_identifier(table_name)}")
+                        cursor.fetchall()
+                        results[table_name] = True
+                        self.logger.info(f"Tabla {table_name} optimizada exitosamente")
+                    except Error as e:
+                        results[table_name] = False
+                        self.logger.error(f"Error optimizando tabla {table_name}: {e}")
+            finally:
+                cursor.close()
         
+        # Los tamaños de tabla cambian tras optimizar
+        self.clear_cache()
+        return results
+
+    def refresh_materialized_views(self, refresh_queries: Dict[str, Any],
+                                   only_missing: bool = False) -> Dict[str, bool]:
+        """Actualiza de forma incremental las tablas de resumen (vistas materializadas)
+        
+        Cada vista se refresca con una sentencia (o una secuencia de sentencias, p. ej.
+        DELETE + REPLACE) con un único parámetro %s: el inicio del día de la última
+        actualización registrada en mv_refresh_log. Así el trabajo es proporcional a
+        los datos cambiados desde entonces y no al tamaño de la tabla. Las sentencias
+        sin %s se ejecutan sin parámetros (útil para reconstruir tablas pequeñas).
+        Las sentencias de una vista se aplican en una transacción junto con su nueva marca.
+        
+        Antes se crean las tablas de sql/materialized_views.sql que aún no existan. Con
+        only_missing=True solo se rellenan las vistas sin marca (nunca refrescadas).
+        """
+        results = {}
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for statement in _load_mv_ddl():
+                    cursor.execute(statement)
+                
+                for view_name, statements in refresh_queries.items():
+                    if isinstance(statements, str):
+                        statements = (statements,)
+                    try:
+                        # La marca se toma del reloj del servidor antes de refrescar
+                        cursor.execute(_MV_WATERMARK_QUERY, (view_name,))
+                        refreshed_at, last_refresh = cursor.fetchall()[0]
+                        if only_missing and last_refresh is not None:
+                            continue
+                        since = (last_refresh or _MV_EPOCH).replace(
+                            hour=0, minute=0, second=0, microsecond=0
+                        )
+                        
+                        # Los lectores no ven la ventana borrada antes de recalcularse
+                        conn.start_transaction()
+                        for statement in statements:
+                            # Las sentencias sin %s (refrescos completos) no llevan parámetro
+                            cursor.execute(statement, (since,) if '%s' in statement else ())
+                        cursor.execute(_MV_WATERMARK_UPDATE, (view_name, refreshed_at))
+                        conn.commit()
+                        
+                        results[view_name] = True
+                        self.logger.info(f"Vista {view_name} actualizada desde {since:%Y-%m-%d}")
+                    except Error as e:
+                        if conn.in_transaction:
+                            conn.rollback()
+                        results[view_name] = False
+                        self.logger.error(f"Error actualizando vista {view_name}: {e}")
+            finally:
+                cursor.close()
+        
+        if results:
+            self.clear_cache()
         return results
 
     def _get_mysqldump_path(self) -> str:
         """Intenta localizar el ejecutable mysqldump en el sistema"""
+        # El ejecutable no cambia de ubicación entre backups
+        if self._mysqldump_path is None:
+            self._mysqldump_path = self._find_mysqldump_path()
+        return self._mysqldump_path
+    
+    def _find_mysqldump_path(self) -> str:
+        """Busca mysqldump en el PATH y en rutas de instalación comunes"""
         # 1. Verificar si está en el PATH del sistema
         if shutil.which('mysqldump'):
             return 'mysqldump'
@@ -232,8 +808,29 @@ class DatabaseManager:
         # Fallback
         return 'mysqldump'
 
+    def _run_compressed_dump(self, cmd: List[str], backup_path: str) -> subprocess.CompletedProcess:
+        """Ejecuta mysqldump comprimiendo la salida con gzip dentro del proceso"""
+        # stderr va a un archivo temporal para no bloquear el proceso mientras se lee stdout
+        with tempfile.TemporaryFile() as stderr_file:
+            with gzip.open(backup_path, 'wb', compresslevel=_BACKUP_COMPRESSLEVEL) as gz_file:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                           bufsize=_BACKUP_BUFFER_SIZE)
+                try:
+                    shutil.copyfileobj(process.stdout, gz_file, _BACKUP_BUFFER_SIZE)
+                finally:
+                    process.stdout.close()
+                    returncode = process.wait()
+            
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace')
+        
+        return subprocess.CompletedProcess(cmd, returncode, stderr=stderr)
+    
     def backup_database(self, backup_path: str) -> bool:
-        """Crea un backup de la base de datos usando mysqldump"""
+        """Crea un backup de la base de datos usando mysqldump
+        
+        Si backup_path termina en '.gz' el volcado se comprime con gzip al escribirse.
+        """
         
         try:
             # Crear directorio si no existe
@@ -256,8 +853,12 @@ class DatabaseManager:
             ]
             
             # Ejecutar backup
-            with open(backup_path, 'w') as backup_file:
-                result = subprocess.run(cmd, stdout=backup_file, stderr=subprocess.PIPE, text=True)
+            if backup_path.endswith('.gz'):
+                result = self._run_compressed_dump(cmd, backup_path)
+            else:
+                # mysqldump escribe directamente en el descriptor del archivo, sin pasar por Python
+                with open(backup_path, 'wb') as backup_file:
+                    result = subprocess.run(cmd, stdout=backup_file, stderr=subprocess.PIPE, text=True)
             
             if result.returncode == 0:
                 self.logger.info(f"Backup creado exitosamente: {backup_path}")
@@ -279,15 +880,31 @@ class DatabaseManager:
         """Prueba la conexión a la base de datos"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor(buffered=True)
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-                cursor.close()
+                # COM_PING: sin cursor ni conjunto de resultados
+                conn.ping(reconnect=False, attempts=1, delay=0)
+                self.is_healthy = True
                 return True
         except Error as e:
             self.logger.error(f"Error en prueba de conexión: {e}")
+            self.is_healthy = False
             return False
     
+    def get_server_info(self) -> Optional[Dict[str, Any]]:
+        """Obtiene versión, host y número de tablas en un solo viaje al servidor
+        
+        También sirve como prueba de conexión: actualiza is_healthy y guarda el
+        resultado en server_info.
+        """
+        try:
+            rows = self.execute_query(_SERVER_INFO_QUERY)
+        except Error:
+            self.is_healthy = False
+            return None
+        
+        self.is_healthy = True
+        self.server_info = rows[0] if rows else {}
+        return self.server_info
+    
     def close_pool(self):
         """Cierra el pool de conexiones"""
         if self._connection_pool:
@@ -295,6 +912,7 @@ class DatabaseManager:
                 # MySQL Connector no tiene método directo para cerrar el pool
                 # pero podemos limpiar las referencias
                 self._connection_pool = None
+                self._prepared_cursors.clear()
                 self.logger.info("Pool de conexiones cerrado")
             except Exception as e:
                 self.logger.error(f"Error cerrando pool: {e}")
\ No newline at end of file
@@ -1,7 +1,10 @@
 """
 Ejemplos de Reportes Personalizados para el Agente SQL
 """
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+import argparse
+import calendar
 import sys
 import os
 
@@ -12,263 +15,471 @@ from database_manager import DatabaseManager
 from report_generator import ReportGenerator
 from config import db_config
 
-def ejemplo_reporte_ventas():
-    """Ejemplo: Reporte de ventas por período"""
+# Segundos durante los que se reutilizan los resultados de un reporte ya generado
+CACHE_TTL_REPORTES = 60
+
+# Consultas de refresco de las tablas de resumen definidas en sql/materialized_views.sql.
+# Las vistas por fecha reciben como único parámetro la fecha desde la que recalcular y
+# borran antes esa ventana para que también se reflejen filas borradas o movidas.
+REFRESCO_VISTAS = MappingProxyType({
+    'mv_ventas_diarias': (
+        """DELETE FROM mv_ventas_diarias WHERE fecha >= %s""",
+        """
+        REPLACE INTO mv_ventas_diarias (fecha, num_ventas, total_ventas)
+        SELECT 
+            DATE(fecha_venta),
+            COUNT(*),
+            SUM(total)
+        FROM ventas 
+        WHERE fecha_venta >= %s
+        GROUP BY DATE(fecha_venta)
+    """),
     
-    # Consultas personalizadas para análisis de ventas
-    consultas_ventas = {
-        'ventas_diarias': """
-            SELECT 
-                DATE(fecha_venta) as fecha,
-                COUNT(*) as num_ventas,
-                SUM(total) as total_ventas,
-                AVG(total) as promedio_venta
-            FROM ventas 
-            WHERE fecha_venta >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(fecha_venta)
-            ORDER BY fecha DESC
-        """,
-        
-        'productos_mas_vendidos': """
-            SELECT 
-                p.nombre as producto,
-                p.categoria,
-                COUNT(v.id) as cantidad_vendida,
-                SUM(v.total) as ingresos_totales
-            FROM ventas v
-            JOIN productos p ON v.producto_id = p.id
-            WHERE v.fecha_venta >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY p.id, p.nombre, p.categoria
-            ORDER BY cantidad_vendida DESC
-            LIMIT 20
-        """,
-        
-        'ventas_por_vendedor': """
-            SELECT 
-                u.nombre as vendedor,
-                u.departamento,
-                COUNT(v.id) as num_ventas,
-                SUM(v.total) as total_vendido,
-                AVG(v.total) as promedio_por_venta
-            FROM ventas v
-            JOIN usuarios u ON v.vendedor_id = u.id
-            WHERE v.fecha_venta >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY u.id, u.nombre, u.departamento
-            ORDER BY total_vendido DESC
-        """,
-        
-        'tendencia_mensual': """
-            SELECT 
-                YEAR(fecha_venta) as año,
-                MONTH(fecha_venta) as mes,
-                COUNT(*) as num_ventas,
-                SUM(total) as total_mes,
-                AVG(total) as promedio_mes
-            FROM ventas 
-            WHERE fecha_venta >= DATE_SUB(NOW(), INTERVAL 12 MONTH)
-            GROUP BY YEAR(fecha_venta), MONTH(fecha_venta)
-            ORDER BY año DESC, mes DESC
+    'mv_registros_diarios': (
+        """DELETE FROM mv_registros_diarios WHERE fecha >= %s""",
         """
-    }
+        REPLACE INTO mv_registros_diarios (fecha, nuevos_registros, desde_web, desde_mobile, desde_api)
+        SELECT 
+            DATE(fecha_registro),
+            COUNT(*),
+            COUNT(CASE WHEN origen_registro = 'web' THEN 1 END),
+            COUNT(CASE WHEN origen_registro = 'mobile' THEN 1 END),
+            COUNT(CASE WHEN origen_registro = 'api' THEN 1 END)
+        FROM usuarios 
+        WHERE fecha_registro >= %s
+        GROUP BY DATE(fecha_registro)
+    """),
+    
+    'mv_movimientos_diarios': (
+        """DELETE FROM mv_movimientos_diarios WHERE fecha >= %s""",
+        """
+        REPLACE INTO mv_movimientos_diarios (fecha, tipo_movimiento, num_movimientos, cantidad_total, valor_total)
+        SELECT 
+            DATE(m.fecha_movimiento),
+            m.tipo_movimiento,
+            COUNT(*),
+            SUM(m.cantidad),
+            SUM(m.cantidad * p.precio_unitario)
+        FROM movimientos_inventario m
+        JOIN productos p ON m.producto_id = p.id
+        WHERE m.fecha_movimiento >= %s
+        GROUP BY DATE(m.fecha_movimiento), m.tipo_movimiento
+    """),
+    
+    'mv_flujo_caja_diario': (
+        """DELETE FROM mv_flujo_caja_diario WHERE fecha >= %s""",
+        """
+        REPLACE INTO mv_flujo_caja_diario (fecha, ingresos, gastos, neto)
+        SELECT 
+            DATE(fecha),
+            SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END),
+            SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END),
+            SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END)
+        FROM transacciones_financieras 
+        WHERE fecha >= %s
+        GROUP BY DATE(fecha)
+    """),
+    
+    'mv_gastos_categoria_diarios': (
+        """DELETE FROM mv_gastos_categoria_diarios WHERE fecha >= %s""",
+        """
+        REPLACE INTO mv_gastos_categoria_diarios 
+            (fecha, categoria, num_transacciones, total_gastado, gasto_minimo, gasto_maximo)
+        SELECT 
+            DATE(fecha),
+            categoria,
+            COUNT(*),
+            SUM(monto),
+            MIN(monto),
+            MAX(monto)
+        FROM transacciones_financieras 
+        WHERE tipo = 'gasto' 
+        AND fecha >= %s
+        GROUP BY DATE(fecha), categoria
+    """),
+    
+    'mv_ventas_enriquecidas': (
+        """DELETE FROM mv_ventas_enriquecidas WHERE fecha_venta >= %s""",
+        """
+        REPLACE INTO mv_ventas_enriquecidas 
+            (venta_id, fecha_venta, total, producto_id, producto_nombre, categoria,
+             vendedor_id, vendedor_nombre, departamento)
+        SELECT 
+            v.id,
+            v.fecha_venta,
+            v.total,
+            p.id,
+            p.nombre,
+            p.categoria,
+            u.id,
+            u.nombre,
+            u.departamento
+        FROM ventas v
+        LEFT JOIN productos p ON v.producto_id = p.id
+        LEFT JOIN usuarios u ON v.vendedor_id = u.id
+        WHERE v.fecha_venta >= %s
+    """),
+    
+    # Se recalcula desde el primer día del mes de la última marca para no dejar
+    # meses agregados a medias
+    'mv_ventas_prod_cat_mes': (
+        """DELETE FROM mv_ventas_prod_cat_mes 
+        WHERE anio * 100 + mes >= EXTRACT(YEAR_MONTH FROM %s)""",
+        """
+        REPLACE INTO mv_ventas_prod_cat_mes 
+            (anio, mes, producto_id, categoria, producto, unidades, ingresos)
+        SELECT 
+            YEAR(fecha_venta),
+            MONTH(fecha_venta),
+            producto_id,
+            categoria,
+            producto_nombre,
+            COUNT(*),
+            SUM(total)
+        FROM mv_ventas_enriquecidas
+        WHERE fecha_venta >= LAST_DAY(%s - INTERVAL 1 MONTH) + INTERVAL 1 DAY
+        AND producto_id IS NOT NULL
+        GROUP BY YEAR(fecha_venta), MONTH(fecha_venta), producto_id, categoria, producto_nombre
+    """),
+    
+    # Tabla pequeña (una fila por producto): se reconstruye entera en cada refresco para
+    # recoger cambios de precio, nombre, categoría o existencias sin movimiento asociado
+    # y para eliminar los productos borrados
+    'mv_productos_inventario': (
+        """DELETE FROM mv_productos_inventario""",
+        """
+        INSERT INTO mv_productos_inventario 
+            (producto_id, codigo, nombre, categoria, precio_unitario, fecha_creacion,
+             cantidad_actual, ultimo_movimiento, ultima_salida)
+        SELECT 
+            p.id,
+            p.codigo,
+            p.nombre,
+            p.categoria,
+            p.precio_unitario,
+            p.fecha_creacion,
+            i.cantidad_actual,
+            (SELECT MAX(m.fecha_movimiento) FROM movimientos_inventario m 
+             WHERE m.producto_id = p.id),
+            (SELECT MAX(m.fecha_movimiento) FROM movimientos_inventario m 
+             WHERE m.producto_id = p.id AND m.tipo_movimiento = 'salida')
+        FROM productos p
+        JOIN inventario i ON p.id = i.producto_id
+    """)
+})
+
+def refrescar_vistas_materializadas(db_manager):
+    """Actualiza las tablas de resumen usadas por los reportes de ejemplo"""
+    return db_manager.refresh_materialized_views(REFRESCO_VISTAS)
+
+def programar_refresco_vistas(scheduler, db_manager, intervalo=3600):
+    """Programa el refresco incremental de las tablas de resumen en el TaskScheduler
+    
+    El refresco solo recalcula lo cambiado desde la última marca (salvo la tabla de
+    productos, pequeña, que se reconstruye entera), así que puede
+    ejecutarse con frecuencia (por defecto cada hora) en lugar de una vez por noche.
+    db_manager es el DatabaseManager del agente (agent.db_manager): el TaskScheduler
+    que construye el agente guarda en su atributo db_manager el propio agente.
+    """
+    return scheduler.add_task(
+        task_id="refresh_materialized_views",
+        name="Refresco de Vistas Materializadas",
+        function=lambda: refrescar_vistas_materializadas(db_manager),
+        schedule_type="interval",
+        schedule_value=intervalo
+    )
+
+def _hace_meses(fecha: date, meses: int) -> date:
+    """Resta meses a una fecha (como DATE_SUB(..., INTERVAL n MONTH) en MySQL)"""
+    total = fecha.year * 12 + fecha.month - 1 - meses
+    anio, mes = divmod(total, 12)
+    dia = min(fecha.day, calendar.monthrange(anio, mes + 1)[1])
+    return date(anio, mes + 1, dia)
+
+def _con_parametros(consultas, parametros):
+    """Asocia a cada consulta los parámetros de fecha calculados una sola vez"""
+    return {nombre: (sql, parametros) for nombre, sql in consultas.items()}
+
+# Consultas de los reportes de ejemplo: se construyen una sola vez al importar el
+# módulo y se exponen como mapeos de solo lectura para compartirlas entre llamadas.
+# Los límites de fecha llegan como parámetros (%(desde)s...) en lugar de calcularse
+# con NOW()/CURDATE() en el servidor, así el texto SQL es siempre el mismo.
+# Los rankings devuelven solo las primeras filas (LIMIT); para recorrer el resto se
+# pueden paginar con generate_custom_report(..., page_size=..., cursor=...)
+
+# Consultas personalizadas para análisis de ventas
+_CONSULTAS_VENTAS = MappingProxyType({
+    'ventas_diarias': """
+        SELECT 
+            fecha,
+            num_ventas,
+            total_ventas,
+            total_ventas / num_ventas as promedio_venta
+        FROM mv_ventas_diarias 
+        WHERE fecha >= %(desde)s
+        ORDER BY fecha DESC
+    """,
+    
+    'productos_mas_vendidos': """
+        SELECT 
+            producto_nombre as producto,
+            categoria,
+            COUNT(*) as cantidad_vendida,
+            SUM(total) as ingresos_totales
+        FROM mv_ventas_enriquecidas
+        WHERE fecha_venta >= %(desde)s
+        AND producto_id IS NOT NULL
+        GROUP BY producto_id, producto_nombre, categoria
+        ORDER BY cantidad_vendida DESC
+        LIMIT 20
+    """,
     
-    return consultas_ventas
+    'ventas_por_vendedor': """
+        SELECT 
+            vendedor_nombre as vendedor,
+            departamento,
+            COUNT(*) as num_ventas,
+            SUM(total) as total_vendido,
+            AVG(total) as promedio_por_venta
+        FROM mv_ventas_enriquecidas
+        WHERE fecha_venta >= %(desde)s
+        AND vendedor_id IS NOT NULL
+        GROUP BY vendedor_id, vendedor_nombre, departamento
+        ORDER BY total_vendido DESC
+        LIMIT 50
+    """,
+    
+    'tendencia_mensual': """
+        SELECT 
+            YEAR(fecha) as año,
+            MONTH(fecha) as mes,
+            SUM(num_ventas) as num_ventas,
+            SUM(total_ventas) as total_mes,
+            SUM(total_ventas) / SUM(num_ventas) as promedio_mes
+        FROM mv_ventas_diarias 
+        WHERE fecha >= %(desde_tendencia)s
+        GROUP BY YEAR(fecha), MONTH(fecha)
+        ORDER BY año DESC, mes DESC
+    """
+})
 
-def ejemplo_reporte_usuarios():
+def ejemplo_reporte_ventas(dias: int = 30):
+    """Ejemplo: Reporte de ventas por período"""
+    hoy = date.today()
+    return _con_parametros(_CONSULTAS_VENTAS, {
+        'desde': hoy - timedelta(days=dias),
+        'desde_tendencia': _hace_meses(hoy, 12)
+    })
+
+_CONSULTAS_USUARIOS = MappingProxyType({
+    'usuarios_activos': """
+        SELECT 
+            DATE(ultimo_acceso) as fecha,
+            COUNT(DISTINCT id) as usuarios_activos,
+            COUNT(DISTINCT CASE WHEN tipo_usuario = 'premium' THEN id END) as usuarios_premium,
+            COUNT(DISTINCT CASE WHEN tipo_usuario = 'basico' THEN id END) as usuarios_basicos
+        FROM usuarios 
+        WHERE ultimo_acceso >= %(desde)s
+        GROUP BY DATE(ultimo_acceso)
+        ORDER BY fecha DESC
+    """,
+    
+    'registros_nuevos': """
+        SELECT 
+            fecha,
+            nuevos_registros,
+            desde_web,
+            desde_mobile,
+            desde_api
+        FROM mv_registros_diarios 
+        WHERE fecha >= %(desde)s
+        ORDER BY fecha DESC
+    """,
+    
+    'usuarios_por_region': """
+        SELECT 
+            pais,
+            region,
+            COUNT(*) as total_usuarios,
+            COUNT(CASE WHEN ultimo_acceso >= %(desde_semana)s THEN 1 END) as activos_semana,
+            AVG(DATEDIFF(NOW(), fecha_registro)) as dias_promedio_antiguedad
+        FROM usuarios 
+        GROUP BY pais, region
+        ORDER BY total_usuarios DESC
+        LIMIT 50
+    """,
+    
+    'engagement_usuarios': """
+        SELECT 
+            tipo_usuario,
+            COUNT(*) as total_usuarios,
+            AVG(sesiones_totales) as promedio_sesiones,
+            AVG(tiempo_total_minutos) as promedio_tiempo_minutos,
+            COUNT(CASE WHEN ultimo_acceso >= %(desde_semana)s THEN 1 END) as activos_ultima_semana
+        FROM usuarios 
+        GROUP BY tipo_usuario
+        ORDER BY promedio_sesiones DESC
+    """
+})
+
+def ejemplo_reporte_usuarios(dias: int = 30):
     """Ejemplo: Reporte de actividad de usuarios"""
+    hoy = date.today()
+    return _con_parametros(_CONSULTAS_USUARIOS, {
+        'desde': hoy - timedelta(days=dias),
+        'desde_semana': hoy - timedelta(days=7)
+    })
+
+_CONSULTAS_INVENTARIO = MappingProxyType({
+    'stock_bajo': """
+        SELECT 
+            p.codigo,
+            p.nombre,
+            p.categoria,
+            i.cantidad_actual,
+            i.stock_minimo,
+            i.stock_maximo,
+            (i.stock_minimo - i.cantidad_actual) as deficit,
+            p.precio_unitario,
+            (i.stock_minimo - i.cantidad_actual) * p.precio_unitario as valor_deficit
+        FROM productos p
+        JOIN inventario i ON p.id = i.producto_id
+        WHERE i.cantidad_actual < i.stock_minimo
+        ORDER BY deficit DESC
+        LIMIT 50
+    """,
     
-    consultas_usuarios = {
-        'usuarios_activos': """
-            SELECT 
-                DATE(ultimo_acceso) as fecha,
-                COUNT(DISTINCT id) as usuarios_activos,
-                COUNT(DISTINCT CASE WHEN tipo_usuario = 'premium' THEN id END) as usuarios_premium,
-                COUNT(DISTINCT CASE WHEN tipo_usuario = 'basico' THEN id END) as usuarios_basicos
-            FROM usuarios 
-            WHERE ultimo_acceso >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(ultimo_acceso)
-            ORDER BY fecha DESC
-        """,
-        
-        'registros_nuevos': """
-            SELECT 
-                DATE(fecha_registro) as fecha,
-                COUNT(*) as nuevos_registros,
-                COUNT(CASE WHEN origen_registro = 'web' THEN 1 END) as desde_web,
-                COUNT(CASE WHEN origen_registro = 'mobile' THEN 1 END) as desde_mobile,
-                COUNT(CASE WHEN origen_registro = 'api' THEN 1 END) as desde_api
-            FROM usuarios 
-            WHERE fecha_registro >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(fecha_registro)
-            ORDER BY fecha DESC
-        """,
-        
-        'usuarios_por_region': """
-            SELECT 
-                pais,
-                region,
-                COUNT(*) as total_usuarios,
-                COUNT(CASE WHEN ultimo_acceso >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as activos_semana,
-                AVG(DATEDIFF(NOW(), fecha_registro)) as dias_promedio_antiguedad
-            FROM usuarios 
-            GROUP BY pais, region
-            ORDER BY total_usuarios DESC
-        """,
-        
-        'engagement_usuarios': """
-            SELECT 
-                tipo_usuario,
-                COUNT(*) as total_usuarios,
-                AVG(sesiones_totales) as promedio_sesiones,
-                AVG(tiempo_total_minutos) as promedio_tiempo_minutos,
-                COUNT(CASE WHEN ultimo_acceso >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as activos_ultima_semana
-            FROM usuarios 
-            GROUP BY tipo_usuario
-            ORDER BY promedio_sesiones DESC
-        """
-    }
+    'movimientos_inventario': """
+        SELECT 
+            fecha,
+            tipo_movimiento,
+            num_movimientos,
+            cantidad_total,
+            valor_total
+        FROM mv_movimientos_diarios
+        WHERE fecha >= %(desde)s
+        ORDER BY fecha DESC, tipo_movimiento
+    """,
+    
+    'productos_sin_movimiento': """
+        SELECT 
+            codigo,
+            nombre,
+            categoria,
+            cantidad_actual,
+            precio_unitario,
+            (cantidad_actual * precio_unitario) as valor_inmovilizado,
+            ultimo_movimiento,
+            DATEDIFF(NOW(), ultimo_movimiento) as dias_sin_movimiento
+        FROM mv_productos_inventario
+        WHERE ultimo_movimiento < %(sin_movimiento_desde)s
+        OR ultimo_movimiento IS NULL
+        ORDER BY dias_sin_movimiento DESC, valor_inmovilizado DESC
+        LIMIT 50
+    """,
     
-    return consultas_usuarios
+    'rotacion_inventario': """
+        SELECT 
+            categoria,
+            COUNT(*) as productos_categoria,
+            SUM(cantidad_actual) as stock_total,
+            SUM(cantidad_actual * precio_unitario) as valor_total,
+            AVG(DATEDIFF(NOW(), COALESCE(ultima_salida, fecha_creacion))) as dias_promedio_rotacion
+        FROM mv_productos_inventario
+        GROUP BY categoria
+        ORDER BY dias_promedio_rotacion ASC
+    """
+})
 
-def ejemplo_reporte_inventario():
+def ejemplo_reporte_inventario(dias: int = 30):
     """Ejemplo: Reporte de gestión de inventario"""
+    hoy = date.today()
+    return _con_parametros(_CONSULTAS_INVENTARIO, {
+        'desde': hoy - timedelta(days=dias),
+        'sin_movimiento_desde': hoy - timedelta(days=90)
+    })
+
+_CONSULTAS_FINANCIERO = MappingProxyType({
+    'ingresos_mensuales': """
+        SELECT 
+            YEAR(fecha) as año,
+            MONTH(fecha) as mes,
+            SUM(ingresos) as ingresos,
+            SUM(gastos) as gastos,
+            SUM(neto) as utilidad_neta
+        FROM mv_flujo_caja_diario 
+        WHERE fecha >= %(desde_ingresos)s
+        GROUP BY YEAR(fecha), MONTH(fecha)
+        ORDER BY año DESC, mes DESC
+    """,
     
-    consultas_inventario = {
-        'stock_bajo': """
-            SELECT 
-                p.codigo,
-                p.nombre,
-                p.categoria,
-                i.cantidad_actual,
-                i.stock_minimo,
-                i.stock_maximo,
-                (i.stock_minimo - i.cantidad_actual) as deficit,
-                p.precio_unitario,
-                (i.stock_minimo - i.cantidad_actual) * p.precio_unitario as valor_deficit
-            FROM productos p
-            JOIN inventario i ON p.id = i.producto_id
-            WHERE i.cantidad_actual < i.stock_minimo
-            ORDER BY deficit DESC
-        """,
-        
-        'movimientos_inventario': """
-            SELECT 
-                DATE(m.fecha_movimiento) as fecha,
-                m.tipo_movimiento,
-                COUNT(*) as num_movimientos,
-                SUM(m.cantidad) as cantidad_total,
-                SUM(m.cantidad * p.precio_unitario) as valor_total
-            FROM movimientos_inventario m
-            JOIN productos p ON m.producto_id = p.id
-            WHERE m.fecha_movimiento >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(m.fecha_movimiento), m.tipo_movimiento
-            ORDER BY fecha DESC, tipo_movimiento
-        """,
-        
-        'productos_sin_movimiento': """
-            SELECT 
-                p.codigo,
-                p.nombre,
-                p.categoria,
-                i.cantidad_actual,
-                p.precio_unitario,
-                (i.cantidad_actual * p.precio_unitario) as valor_inmovilizado,
-                MAX(m.fecha_movimiento) as ultimo_movimiento,
-                DATEDIFF(NOW(), MAX(m.fecha_movimiento)) as dias_sin_movimiento
-            FROM productos p
-            JOIN inventario i ON p.id = i.producto_id
-            LEFT JOIN movimientos_inventario m ON p.id = m.producto_id
-            GROUP BY p.id, p.codigo, p.nombre, p.categoria, i.cantidad_actual, p.precio_unitario
-            HAVING dias_sin_movimiento > 90 OR ultimo_movimiento IS NULL
-            ORDER BY dias_sin_movimiento DESC, valor_inmovilizado DESC
-        """,
-        
-        'rotacion_inventario': """
-            SELECT 
-                p.categoria,
-                COUNT(DISTINCT p.id) as productos_categoria,
-                SUM(i.cantidad_actual) as stock_total,
-                SUM(i.cantidad_actual * p.precio_unitario) as valor_total,
-                AVG(DATEDIFF(NOW(), COALESCE(m.ultima_salida, p.fecha_creacion))) as dias_promedio_rotacion
-            FROM productos p
-            JOIN inventario i ON p.id = i.producto_id
-            LEFT JOIN (
-                SELECT 
-                    producto_id, 
-                    MAX(fecha_movimiento) as ultima_salida
-                FROM movimientos_inventario 
-                WHERE tipo_movimiento = 'salida'
-                GROUP BY producto_id
-            ) m ON p.id = m.producto_id
-            GROUP BY p.categoria
-            ORDER BY dias_promedio_rotacion ASC
-        """
-    }
+    'gastos_por_categoria': """
+        SELECT 
+            categoria,
+            SUM(num_transacciones) as num_transacciones,
+            SUM(total_gastado) as total_gastado,
+            SUM(total_gastado) / SUM(num_transacciones) as promedio_por_transaccion,
+            MIN(gasto_minimo) as gasto_minimo,
+            MAX(gasto_maximo) as gasto_maximo
+        FROM mv_gastos_categoria_diarios 
+        WHERE fecha >= %(desde_gastos)s
+        GROUP BY categoria
+        ORDER BY total_gastado DESC
+        LIMIT 50
+    """,
     
-    return consultas_inventario
+    'flujo_caja_diario': """
+        SELECT 
+            fecha,
+            ingresos as ingresos_dia,
+            gastos as gastos_dia,
+            neto as flujo_neto_dia
+        FROM mv_flujo_caja_diario 
+        WHERE fecha >= %(desde)s
+        ORDER BY fecha DESC
+    """,
+    
+    'cuentas_por_cobrar': """
+        SELECT 
+            cliente,
+            COUNT(*) as facturas_pendientes,
+            SUM(monto_pendiente) as total_por_cobrar,
+            MIN(fecha_vencimiento) as vencimiento_mas_proximo,
+            MAX(DATEDIFF(NOW(), fecha_vencimiento)) as dias_vencido_maximo,
+            AVG(DATEDIFF(NOW(), fecha_emision)) as dias_promedio_pendiente
+        FROM cuentas_por_cobrar 
+        WHERE estado = 'pendiente'
+        GROUP BY cliente
+        ORDER BY total_por_cobrar DESC
+        LIMIT 50
+    """
+})
 
-def ejemplo_reporte_financiero():
+def ejemplo_reporte_financiero(dias: int = 30):
     """Ejemplo: Reporte financiero básico"""
-    
-    consultas_financiero = {
-        'ingresos_mensuales': """
-            SELECT 
-                YEAR(fecha) as año,
-                MONTH(fecha) as mes,
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) as ingresos,
-                SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) as gastos,
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END) as utilidad_neta
-            FROM transacciones_financieras 
-            WHERE fecha >= DATE_SUB(NOW(), INTERVAL 12 MONTH)
-            GROUP BY YEAR(fecha), MONTH(fecha)
-            ORDER BY año DESC, mes DESC
-        """,
-        
-        'gastos_por_categoria': """
-            SELECT 
-                categoria,
-                COUNT(*) as num_transacciones,
-                SUM(monto) as total_gastado,
-                AVG(monto) as promedio_por_transaccion,
-                MIN(monto) as gasto_minimo,
-                MAX(monto) as gasto_maximo
-            FROM transacciones_financieras 
-            WHERE tipo = 'gasto' 
-            AND fecha >= DATE_SUB(NOW(), INTERVAL 3 MONTH)
-            GROUP BY categoria
-            ORDER BY total_gastado DESC
-        """,
-        
-        'flujo_caja_diario': """
-            SELECT 
-                DATE(fecha) as fecha,
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) as ingresos_dia,
-                SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) as gastos_dia,
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END) as flujo_neto_dia
-            FROM transacciones_financieras 
-            WHERE fecha >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(fecha)
-            ORDER BY fecha DESC
-        """,
-        
-        'cuentas_por_cobrar': """
-            SELECT 
-                cliente,
-                COUNT(*) as facturas_pendientes,
-                SUM(monto_pendiente) as total_por_cobrar,
-                MIN(fecha_vencimiento) as vencimiento_mas_proximo,
-                MAX(DATEDIFF(NOW(), fecha_vencimiento)) as dias_vencido_maximo,
-                AVG(DATEDIFF(NOW(), fecha_emision)) as dias_promedio_pendiente
-            FROM cuentas_por_cobrar 
-            WHERE estado = 'pendiente'
-            GROUP BY cliente
-            ORDER BY total_por_cobrar DESC
-        """
-    }
-    
-    return consultas_financiero
+    hoy = date.today()
+    return _con_parametros(_CONSULTAS_FINANCIERO, {
+        'desde': hoy - timedelta(days=dias),
+        'desde_ingresos': _hace_meses(hoy, 12),
+        'desde_gastos': _hace_meses(hoy, 3)
+    })
+
+# Reportes de ejemplo por tipo: función que construye las consultas y nombre del reporte
+TIPOS_REPORTE = MappingProxyType({
+    'ventas': (ejemplo_reporte_ventas, "Análisis de Ventas - 30 días"),
+    'usuarios': (ejemplo_reporte_usuarios, "Actividad de Usuarios - 30 días"),
+    'inventario': (ejemplo_reporte_inventario, "Gestión de Inventario"),
+    'financiero': (ejemplo_reporte_financiero, "Reporte Financiero"),
+})
+
+_OPCIONES_REPORTE = {"1": 'ventas', "2": 'usuarios', "3": 'inventario', "4": 'financiero'}
 
-def generar_reporte_ejemplo():
-    """Función principal para generar un reporte de ejemplo"""
+def generar_reporte_ejemplo(tipo=None, preparadas=False):
+    """Función principal para generar un reporte de ejemplo (tipo: clave de TIPOS_REPORTE)
+    
+    Con preparadas=True cada consulta se ejecuta como sentencia preparada, que el
+    servidor reutiliza sin volver a analizarla (útil si el reporte se genera a menudo).
+    """
     
     try:
         # Inicializar componentes
@@ -282,36 +493,36 @@ def generar_reporte_ejemplo():
         
         print("✅ Conexión a base de datos establecida")
         
-        # Seleccionar tipo de reporte
-        print("\n📊 Tipos de reportes disponibles:")
-        print("1. Reporte de Ventas")
-        print("2. Reporte de Usuarios")
-        print("3. Reporte de Inventario")
-        print("4. Reporte Financiero")
-        
-        opcion = input("\nSelecciona el tipo de reporte (1-4): ").strip()
+        # Seleccionar tipo de reporte (solo se pregunta si no se indicó por argumento)
+        if tipo is None:
+            print("\n📊 Tipos de reportes disponibles:")
+            print("1. Reporte de Ventas")
+            print("2. Reporte de Usuarios")
+            print("3. Reporte de Inventario")
+            print("4. Reporte Financiero")
+            
+            opcion = input("\nSelecciona el tipo de reporte (1-4): ").strip()
+            tipo = _OPCIONES_REPORTE.get(opcion)
         
-        # Obtener consultas según la opción
-        if opcion == "1":
-            consultas = ejemplo_reporte_ventas()
-            nombre_reporte = "Análisis de Ventas - 30 días"
-        elif opcion == "2":
-            consultas = ejemplo_reporte_usuarios()
-            nombre_reporte = "Actividad de Usuarios - 30 días"
-        elif opcion == "3":
-            consultas = ejemplo_reporte_inventario()
-            nombre_reporte = "Gestión de Inventario"
-        elif opcion == "4":
-            consultas = ejemplo_reporte_financiero()
-            nombre_reporte = "Reporte Financiero"
-        else:
+        # Obtener consultas según el tipo
+        if tipo not in TIPOS_REPORTE:
             print("❌ Opción no válida")
             return
         
+        generar_consultas, nombre_reporte = TIPOS_REPORTE[tipo]
+        consultas = generar_consultas()
+        
+        # Las tablas de resumen se crean y rellenan la primera vez que se necesitan
+        pendientes = db_manager.refresh_materialized_views(REFRESCO_VISTAS, only_missing=True)
+        if pendientes:
+            print(f"🔄 Vistas materializadas rellenadas por primera vez: {', '.join(pendientes)}")
+        
         print(f"\n🔄 Generando {nombre_reporte}...")
         
         # Generar reporte personalizado
-        resultado = report_generator.generate_custom_report(consultas, nombre_reporte)
+        resultado = report_generator.generate_custom_report(
+            consultas, nombre_reporte, cache_ttl=CACHE_TTL_REPORTES, prepared=preparadas
+        )
         
         print(f"✅ Reporte generado exitosamente!")
         print(f"📁 Consultas ejecutadas: {len(resultado.get('results', {}))}")
@@ -320,9 +531,11 @@ def generar_reporte_ejemplo():
         
         # Mostrar resumen de resultados
         print(f"\n📈 Resumen de datos:")
-        for query_name, result in resultado.get('results', {}).items():
+        resultados = resultado.get('results', {})
+        for query_name, result in resultados.items():
             if not query_name.endswith('_summary') and isinstance(result, list):
-                print(f"  • {query_name.replace('_', ' ').title()}: {len(result)} registros")
+                registros = resultados.get(f"{query_name}_summary", {}).get('row_count', len(result))
+                print(f"  • {query_name.replace('_', ' ').title()}: {registros} registros")
         
     except Exception as e:
         print(f"❌ Error generando reporte: {e}")
@@ -332,6 +545,21 @@ def generar_reporte_ejemplo():
         if 'db_manager' in locals():
             db_manager.close_pool()
 
+def refrescar_vistas_ejemplo():
+    """Refresca manualmente las tablas de resumen de los reportes de ejemplo"""
+    
+    db_manager = DatabaseManager(db_config)
+    try:
+        print("\n🔄 Actualizando vistas materializadas...")
+        resultados = refrescar_vistas_materializadas(db_manager)
+        
+        for vista, ok in resultados.items():
+            print(f"  {'✅' if ok else '❌'} {vista}")
+    except Exception as e:
+        print(f"❌ Error actualizando vistas: {e}")
+    finally:
+        db_manager.close_pool()
+
 def mostrar_consulta_ejemplo():
     """Muestra un ejemplo de consulta personalizada"""
     
@@ -340,33 +568,33 @@ def mostrar_consulta_ejemplo():
     
     consulta_ejemplo = """
     -- Análisis de rendimiento de productos por mes
+    -- (lee de mv_ventas_prod_cat_mes: ventas ya agregadas por producto y mes,
+    -- así las funciones de ventana ordenan pocas filas)
     SELECT 
-        p.categoria,
-        p.nombre as producto,
-        YEAR(v.fecha_venta) as año,
-        MONTH(v.fecha_venta) as mes,
-        COUNT(v.id) as unidades_vendidas,
-        SUM(v.total) as ingresos_totales,
-        AVG(v.total) as precio_promedio,
+        categoria,
+        producto,
+        anio as año,
+        mes,
+        unidades as unidades_vendidas,
+        ingresos as ingresos_totales,
+        ingresos / unidades as precio_promedio,
         
         -- Calcular ranking dentro de la categoría
         RANK() OVER (
-            PARTITION BY p.categoria, YEAR(v.fecha_venta), MONTH(v.fecha_venta) 
-            ORDER BY SUM(v.total) DESC
+            PARTITION BY categoria, anio, mes 
+            ORDER BY ingresos DESC
         ) as ranking_categoria,
         
         -- Calcular porcentaje del total de la categoría
         ROUND(
-            SUM(v.total) * 100.0 / SUM(SUM(v.total)) OVER (
-                PARTITION BY p.categoria, YEAR(v.fecha_venta), MONTH(v.fecha_venta)
+            ingresos * 100.0 / SUM(ingresos) OVER (
+                PARTITION BY categoria, anio, mes
             ), 2
         ) as porcentaje_categoria
         
-    FROM ventas v
-    JOIN productos p ON v.producto_id = p.id
-    WHERE v.fecha_venta >= DATE_SUB(NOW(), INTERVAL 6 MONTH)
-    GROUP BY p.categoria, p.id, p.nombre, YEAR(v.fecha_venta), MONTH(v.fecha_venta)
-    HAVING unidades_vendidas >= 5  -- Solo productos con ventas significativas
+    FROM mv_ventas_prod_cat_mes
+    WHERE anio * 12 + mes >= YEAR(CURDATE()) * 12 + MONTH(CURDATE()) - 6
+    AND unidades >= 5  -- Solo productos con ventas significativas
     ORDER BY año DESC, mes DESC, categoria, ranking_categoria
     """
     
@@ -380,17 +608,19 @@ def mostrar_consulta_ejemplo():
     print("  • Ordena resultados de manera lógica")
     print("  • Usa alias descriptivos para claridad")
 
-if __name__ == "__main__":
+def menu_interactivo():
+    """Menú interactivo de los ejemplos"""
     print("🤖 Ejemplos de Reportes Personalizados - Agente SQL")
     print("=" * 60)
     
     print("\nOpciones disponibles:")
     print("1. Generar reporte de ejemplo")
     print("2. Mostrar consulta de ejemplo")
-    print("3. Salir")
+    print("3. Refrescar vistas materializadas")
+    print("4. Salir")
     
     while True:
-        opcion = input("\nSelecciona una opción (1-3): ").strip()
+        opcion = input("\nSelecciona una opción (1-4): ").strip()
         
         if opcion == "1":
             generar_reporte_ejemplo()
@@ -399,7 +629,40 @@ if __name__ == "__main__":
             mostrar_consulta_ejemplo()
             break
         elif opcion == "3":
+            refrescar_vistas_ejemplo()
+            break
+        elif opcion == "4":
             print("👋 ¡Hasta luego!")
             break
         else:
-            print("❌ Opción no válida. Intenta de nuevo.")
\ No newline at end of file
+            print("❌ Opción no válida. Intenta de nuevo.")
+
+def main(argv=None):
+    """Punto de entrada: con argumentos se ejecuta la acción indicada sin menú"""
+    
+    parser = argparse.ArgumentParser(description='Ejemplos de Reportes Personalizados - Agente SQL')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--tipo', choices=list(TIPOS_REPORTE),
+                       help='Genera el reporte de ejemplo indicado')
+    group.add_argument('--mostrar-consulta', action='store_true',
+                       help='Muestra la consulta de ejemplo')
+    group.add_argument('--refrescar-vistas', action='store_true',
+                       help='Refresca las vistas materializadas')
+    parser.add_argument('--preparadas', action='store_true',
+                        help='Ejecuta las consultas del reporte como sentencias preparadas')
+    
+    args = parser.parse_args(argv)
+    
+    if args.tipo:
+        generar_reporte_ejemplo(args.tipo, preparadas=args.preparadas)
+    elif args.mostrar_consulta:
+        mostrar_consulta_ejemplo()
+    else:
+        refrescar_vistas_ejemplo()
+
+if __name__ == "__main__":
+    # Sin argumentos se mantiene el menú interactivo
+    if len(sys.argv) > 1:
+        main()
+    else:
+        menu_interactivo()
@@ -1,10 +1,11 @@
 """
 Lanzador del Dashboard Web - Ejemplo de uso
 """
+import argparse
 import sys
 import os
-import threading
-import time
+import atexit
+import signal
 from datetime import datetime
 
 # Añadir el directorio padre al path
@@ -13,6 +14,32 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import SQLAutomationAgent
 from web_dashboard import WebDashboard
 
+# Agente compartido entre acciones del menú: se inicializa en el primer uso y se
+# detiene al salir, en lugar de crear y cerrar el pool en cada acción
+_agent = None
+
+def _get_or_create_agent():
+    """Devuelve el agente compartido, inicializándolo la primera vez"""
+    global _agent
+    
+    if _agent is None:
+        agent = SQLAutomationAgent()
+        print("🔧 Inicializando componentes básicos...")
+        if not agent.initialize():
+            agent.stop()
+            return None
+        
+        atexit.register(agent.stop)
+        _agent = agent
+    
+    return _agent
+
+def _write_block(lines):
+    """Escribe un bloque de líneas en stdout con una sola escritura"""
+    # print() por línea provoca un flush por línea en terminales con buffer de línea
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
 def launch_dashboard_with_agent():
     """Lanza el agente completo con dashboard web"""
     
@@ -39,6 +66,12 @@ def launch_dashboard_with_agent():
         
         print("✅ Servicios iniciados exitosamente")
         
+        # Los manejadores de start() solo marcan la parada para wait_until_stopped();
+        # aquí el dashboard bloquea, así que las señales interrumpen el servidor y el
+        # finally de abajo hace la única llamada a stop()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        
         # Crear dashboard web
         print("🌐 Configurando dashboard web...")
         dashboard = WebDashboard(
@@ -51,54 +84,53 @@ def launch_dashboard_with_agent():
         print("✅ Dashboard configurado")
         
         # Mostrar información del sistema
-        print("\n📊 Estado inicial del sistema:")
-        print("-" * 40)
+        status_lines = ["\n📊 Estado inicial del sistema:", "-" * 40]
         
-        # Estado de conexión
-        if agent.db_manager.test_connection():
-            print("🟢 Base de datos: Conectada")
+        # Estado de conexión (comprobado durante la inicialización)
+        if agent.db_manager.is_healthy:
+            status_lines.append("🟢 Base de datos: Conectada")
         else:
-            print("🔴 Base de datos: Desconectada")
+            status_lines.append("🔴 Base de datos: Desconectada")
         
         # Estado del monitoreo
         monitoring_status = agent.monitoring_system.get_monitoring_status()
         if monitoring_status['monitoring_active']:
-            print("🟢 Monitoreo: Activo")
+            status_lines.append("🟢 Monitoreo: Activo")
         else:
-            print("🔴 Monitoreo: Inactivo")
+            status_lines.append("🔴 Monitoreo: Inactivo")
         
         # Estado del programador
         scheduler_status = agent.scheduler.get_task_status()
-        print(f"🟢 Programador: {scheduler_status['enabled_tasks']}/{scheduler_status['total_tasks']} tareas activas")
+        status_lines.append(f"🟢 Programador: {scheduler_status['enabled_tasks']}/{scheduler_status['total_tasks']} tareas activas")
         
         # Alertas activas
         active_alerts = len(agent.monitoring_system.alert_manager.active_alerts)
         if active_alerts > 0:
-            print(f"🟡 Alertas: {active_alerts} activas")
+            status_lines.append(f"🟡 Alertas: {active_alerts} activas")
         else:
-            print("🟢 Alertas: Sin alertas activas")
+            status_lines.append("🟢 Alertas: Sin alertas activas")
         
-        print("-" * 40)
+        status_lines.append("-" * 40)
+        _write_block(status_lines)
         
         # Información de acceso
-        print(f"\n🌐 Dashboard Web disponible en:")
-        print(f"   • Local: http://localhost:5000")
-        print(f"   • Red:   http://0.0.0.0:5000")
-        print(f"\n⏰ Iniciado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        print(f"\n💡 Funcionalidades disponibles:")
-        print(f"   • Monitoreo en tiempo real")
-        print(f"   • Gestión de alertas")
-        print(f"   • Control de tareas programadas")
-        print(f"   • Generación manual de reportes")
-        print(f"   • Descarga de backups y reportes")
-        
-        print(f"\n🔄 El sistema se actualiza automáticamente cada 30 segundos")
-        print(f"📧 Las alertas se envían por email (si está configurado)")
-        
-        print(f"\n" + "=" * 60)
-        print(f"🎯 Para detener el sistema, presiona Ctrl+C")
-        print(f"=" * 60)
+        _write_block([
+            f"\n🌐 Dashboard Web disponible en:",
+            f"   • Local: http://localhost:5000",
+            f"   • Red:   http://0.0.0.0:5000",
+            f"\n⏰ Iniciado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"\n💡 Funcionalidades disponibles:",
+            f"   • Monitoreo en tiempo real",
+            f"   • Gestión de alertas",
+            f"   • Control de tareas programadas",
+            f"   • Generación manual de reportes",
+            f"   • Descarga de backups y reportes",
+            f"\n🔄 El sistema se actualiza automáticamente cada 30 segundos",
+            f"📧 Las alertas se envían por email (si está configurado)",
+            f"\n" + "=" * 60,
+            f"🎯 Para detener el sistema, presiona Ctrl+C",
+            f"=" * 60
+        ])
         
         # Ejecutar dashboard (esto bloquea hasta que se detenga)
         dashboard.run(host='0.0.0.0', port=5000, debug=False)
@@ -115,19 +147,16 @@ def launch_dashboard_with_agent():
         agent.stop()
         print("✅ Sistema detenido correctamente")
 
-def launch_dashboard_only():
+def launch_dashboard_only(agent=None):
     """Lanza solo el dashboard sin servicios automáticos"""
     
     print("🌐 Iniciando Dashboard Web (Solo Visualización)")
     print("=" * 50)
     
-    # Crear instancia del agente sin iniciar servicios automáticos
-    agent = SQLAutomationAgent()
-    
     try:
-        # Solo inicializar componentes básicos
-        print("🔧 Inicializando componentes básicos...")
-        if not agent.initialize():
+        # Agente compartido, solo con componentes básicos (sin servicios automáticos)
+        agent = agent or _get_or_create_agent()
+        if agent is None:
             print("❌ Error: No se pudo inicializar el agente")
             return
         
@@ -154,39 +183,36 @@ def launch_dashboard_only():
         
     except Exception as e:
         print(f"❌ Error: {e}")
-        
-    finally:
-        agent.stop()
 
-def show_system_info():
+def show_system_info(agent=None):
     """Muestra información del sistema sin iniciar servicios"""
     
     print("ℹ️ Información del Sistema SQL Agent")
     print("=" * 40)
     
-    agent = SQLAutomationAgent()
-    
     try:
-        if agent.initialize():
+        recien_creado = agent is None and _agent is None
+        agent = agent or _get_or_create_agent()
+        if agent is not None:
+            # initialize() acaba de obtener el estado; un agente reutilizado puede tenerlo
+            # desfasado, así que se consulta de nuevo (un solo viaje al servidor)
+            if not recien_creado:
+                agent.db_manager.get_server_info()
+            
             # Información de base de datos
             print("📊 Base de Datos:")
             print(f"   Host: {agent.db_manager.config.host}")
             print(f"   Puerto: {agent.db_manager.config.port}")
             print(f"   Base de datos: {agent.db_manager.config.database}")
             
-            # Probar conexión
-            if agent.db_manager.test_connection():
+            # Estado y datos del servidor
+            if agent.db_manager.is_healthy:
                 print("   Estado: 🟢 Conectada")
                 
-                # Obtener métricas básicas
-                try:
-                    metrics = agent.db_manager.get_database_metrics()
-                    if metrics:
-                        print("   Métricas disponibles: ✅")
-                    else:
-                        print("   Métricas disponibles: ❌")
-                except:
-                    print("   Métricas disponibles: ❌")
+                server_info = agent.db_manager.server_info or {}
+                print(f"   Versión: {server_info.get('version', 'N/A')}")
+                print(f"   Servidor: {server_info.get('hostname', 'N/A')}")
+                print(f"   Tablas: {server_info.get('table_count', 'N/A')}")
                     
             else:
                 print("   Estado: 🔴 Desconectada")
@@ -212,7 +238,9 @@ def show_system_info():
                 ("Backups", automation_config.backup_dir)
             ]:
                 if os.path.exists(dir_path):
-                    files_count = len([f for f in os.listdir(dir_path) if os.path.isfile(os.path.join(dir_path, f))])
+                    # scandir reutiliza el tipo de entrada del directorio sin un stat() por archivo
+                    with os.scandir(dir_path) as entries:
+                        files_count = sum(1 for entry in entries if entry.is_file())
                     print(f"   {dir_name}: 📂 {files_count} archivos")
                 else:
                     print(f"   {dir_name}: 📂 No existe (se creará automáticamente)")
@@ -222,9 +250,24 @@ def show_system_info():
             
     except Exception as e:
         print(f"❌ Error obteniendo información: {e}")
-        
-    finally:
-        agent.stop()
+
+# Acciones ejecutables directamente con --mode, sin pasar por el menú
+_MODES = {
+    'full': launch_dashboard_with_agent,
+    'dashboard': launch_dashboard_only,
+    'info': show_system_info,
+}
+
+def run_mode(argv=None):
+    """Ejecuta la acción indicada por línea de comandos sin menú interactivo"""
+    
+    parser = argparse.ArgumentParser(description='SQL Automation Agent - Dashboard Launcher')
+    parser.add_argument('--mode', choices=list(_MODES), required=True,
+                        help='full: agente completo con dashboard, dashboard: solo visualización, '
+                             'info: información del sistema')
+    
+    args = parser.parse_args(argv)
+    _MODES[args.mode]()
 
 def main():
     """Función principal del lanzador"""
@@ -251,6 +294,7 @@ def main():
                 break
                 
             elif opcion == "3":
+                # Reutiliza el agente compartido en cada consulta de información
                 show_system_info()
                 input("\nPresiona Enter para continuar...")
                 
@@ -268,4 +312,8 @@ def main():
             print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Sin argumentos se mantiene el menú interactivo
+    if len(sys.argv) > 1:
+        run_mode()
+    else:
+        main()
\ No newline at end of file
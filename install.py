@@ -6,15 +6,113 @@ import sys
 import subprocess
 import shutil
 from pathlib import Path
-import mysql.connector
-from mysql.connector import Error
+from string import Template
+from concurrent.futures import ThreadPoolExecutor
+
+# Con menos paquetes que este límite se instalan indicándolos directamente a pip
+_INLINE_REQUIREMENTS_MAX = 20
+
+# Comprobaciones de permisos: consulta y mensajes de éxito y de fallo
+_PERMISSION_CHECKS = [
+    ("SELECT 1",
+     "✅ Permisos de SELECT - OK",
+     "❌ Sin permisos de SELECT"),
+    ("SELECT COUNT(*) FROM performance_schema.global_status LIMIT 1",
+     "✅ Acceso a performance_schema - OK",
+     "⚠️ Sin acceso a performance_schema (monitoreo limitado)"),
+    ("SELECT COUNT(*) FROM information_schema.tables LIMIT 1",
+     "✅ Acceso a information_schema - OK",
+     "⚠️ Sin acceso a information_schema (reportes limitados)"),
+]
+
+# Textos fijos del instalador
+_HEADER = """🤖 SQL Automation Agent - Instalador Automático
+============================================================
+Este script te ayudará a configurar el agente paso a paso
+============================================================
+"""
+
+_COMPLETION_MESSAGE = """
+🎉 ¡Instalación Completada!
+==================================================
+
+📋 Próximos pasos:
+1. Ejecutar el agente:
+   • Linux/macOS: ./start_agent.sh
+   • Windows: start_agent.bat
+   • Manual: python main.py --mode interactive
+
+2. Acceder al dashboard web:
+   • Ejecutar: python examples/dashboard_launcher.py
+   • Abrir: http://localhost:5000
+
+3. Generar reportes personalizados:
+   • Ejecutar: python examples/custom_reports.py
+
+📁 Archivos importantes:
+   • .env - Configuración principal
+   • logs/sql_agent.log - Logs del sistema
+   • reports/ - Reportes generados
+   • backups/ - Backups automáticos
+
+📖 Documentación:
+   • README.md - Documentación completa
+   • examples/ - Ejemplos de uso
+
+🆘 Soporte:
+   • Revisa los logs en caso de problemas
+   • Verifica la configuración en .env
+   • Consulta README.md para más detalles
+"""
+
+# Plantilla del archivo .env generado por el instalador
+_ENV_TEMPLATE = Template("""# Configuración de Base de Datos
+DB_HOST=$DB_HOST
+DB_PORT=$DB_PORT
+DB_USER=$DB_USER
+DB_PASSWORD=$DB_PASSWORD
+DB_NAME=$DB_NAME
+DB_CHARSET=utf8mb4
+
+# Configuración de Automatización
+REPORTS_ENABLED=true
+REPORTS_SCHEDULE=daily
+REPORTS_OUTPUT_DIR=reports
+
+MONITORING_ENABLED=true
+MONITORING_INTERVAL=300
+
+BACKUP_ENABLED=true
+BACKUP_SCHEDULE=daily
+BACKUP_RETENTION_DAYS=30
+BACKUP_DIR=backups
+
+# Umbrales de Alertas
+ALERT_CPU_USAGE=80.0
+ALERT_MEMORY_USAGE=85.0
+ALERT_DISK_USAGE=90.0
+ALERT_CONNECTION_COUNT=100
+ALERT_SLOW_QUERY_TIME=5.0
+
+# Configuración de Logs
+LOG_LEVEL=INFO
+LOG_FILE=logs/sql_agent.log
+LOG_MAX_SIZE=10485760
+LOG_BACKUP_COUNT=5
+
+# Configuración de Email$EMAIL_STATUS
+EMAIL_SMTP_SERVER=$EMAIL_SMTP_SERVER
+EMAIL_SMTP_PORT=$EMAIL_SMTP_PORT
+EMAIL_USERNAME=$EMAIL_USERNAME
+EMAIL_PASSWORD=$EMAIL_PASSWORD
+EMAIL_FROM=$EMAIL_FROM
+EMAIL_TO=$EMAIL_TO
+""")
 
 def print_header():
     """Imprime el header del instalador"""
-    print("🤖 SQL Automation Agent - Instalador Automático")
-    print("=" * 60)
-    print("Este script te ayudará a configurar el agente paso a paso")
-    print("=" * 60)
+    # Texto fijo: una sola escritura en lugar de un print por línea
+    sys.stdout.write(_HEADER)
 
 def check_python_version():
     """Verifica la versión de Python"""
@@ -32,12 +130,11 @@ def check_mysql_client():
     """Verifica si mysqldump está disponible"""
     print("\n🗄️ Verificando cliente MySQL...")
     
-    try:
-        result = subprocess.run(['mysqldump', '--version'], 
-                              capture_output=True, text=True, check=True)
+    # Basta con localizarlo en el PATH: no hace falta ejecutarlo para leer la versión
+    if shutil.which('mysqldump'):
         print("✅ mysqldump encontrado - OK")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    else:
         print("❌ Error: mysqldump no encontrado")
         print("   Instala MySQL client o MariaDB client")
         print("   Ubuntu/Debian: sudo apt install mysql-client")
@@ -55,9 +152,18 @@ def install_dependencies():
             print("❌ Error: requirements.txt no encontrado")
             return False
         
-        # Instalar dependencias
-        result = subprocess.run([
-            sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'
+        # Paquetes de requirements.txt (sin comentarios ni líneas vacías)
+        with open('requirements.txt', encoding='utf-8') as f:
+            packages = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+        
+        # Listas cortas se pasan directamente en la línea de comandos
+        requirements = packages if len(packages) < _INLINE_REQUIREMENTS_MAX else ['-r', 'requirements.txt']
+        
+        # Instalar dependencias en una sola llamada a pip, sin avisos ni preguntas
+        subprocess.run([
+            sys.executable, '-m', 'pip', 'install',
+            '--disable-pip-version-check', '--no-input', '--prefer-binary',
+            '--progress-bar', 'off', *requirements
         ], check=True, capture_output=True, text=True)
         
         print("✅ Dependencias instaladas exitosamente")
@@ -65,6 +171,9 @@ def install_dependencies():
         
     except subprocess.CalledProcessError as e:
         print(f"❌ Error instalando dependencias: {e}")
+        # La salida de pip solo se muestra si falla
+        if e.stderr:
+            print(e.stderr.strip())
         print("Intenta instalar manualmente: pip install -r requirements.txt")
         return False
 
@@ -79,16 +188,34 @@ def create_directories():
         'examples'
     ]
     
-    for directory in directories:
-        try:
-            os.makedirs(directory, exist_ok=True)
-            print(f"✅ Directorio creado: {directory}/")
-        except Exception as e:
-            print(f"❌ Error creando directorio {directory}: {e}")
-            return False
+    try:
+        for directory in directories:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+    except Exception as e:
+        print(f"❌ Error creando directorio {directory}: {e}")
+        return False
     
+    print("\n".join(f"✅ Directorio creado: {directory}/" for directory in directories))
     return True
 
+def _iter_statement_results(cursor, script):
+    """Itera los resultados de un script multi-sentencia, uno por sentencia"""
+    # mysql-connector 8.x devuelve un iterador con multi=True; 9.x usa nextset()
+    try:
+        results = cursor.execute(script, multi=True)
+    except TypeError:
+        results = None
+    
+    if results is not None:
+        yield from results
+        return
+    
+    cursor.execute(script)
+    while True:
+        yield cursor
+        if not cursor.nextset():
+            break
+
 def configure_database():
     """Configura la conexión a la base de datos"""
     print("\n🗄️ Configuración de Base de Datos")
@@ -100,67 +227,79 @@ def configure_database():
     host = input("Host (localhost): ").strip() or "localhost"
     port = input("Puerto (3306): ").strip() or "3306"
     username = input("Usuario: ").strip()
+    if not username:
+        print("❌ Error: Usuario y base de datos son obligatorios")
+        return None
     password = input("Contraseña: ").strip()
+    
+    # Importación diferida: mysql-connector se instala en install_dependencies()
+    import mysql.connector
+    from mysql.connector import Error
+    
+    # La conexión (TCP, TLS y autenticación) se abre en segundo plano mientras
+    # se escribe el nombre de la base de datos, que se selecciona después
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending_connection = executor.submit(
+        mysql.connector.connect,
+        host=host,
+        port=int(port),
+        user=username,
+        password=password
+    )
+    executor.shutdown(wait=False)
+    
     database = input("Base de datos: ").strip()
     
-    if not username or not database:
+    if not database:
         print("❌ Error: Usuario y base de datos son obligatorios")
+        # Cerrar la conexión anticipada si llega a abrirse
+        pending_connection.add_done_callback(
+            lambda future: future.exception() is None and future.result().close()
+        )
         return None
     
     # Probar conexión
     print(f"\n🔍 Probando conexión a {username}@{host}:{port}/{database}...")
     
     try:
-        connection = mysql.connector.connect(
-            host=host,
-            port=int(port),
-            user=username,
-            password=password,
-            database=database
-        )
+        connection = pending_connection.result()
+        connection.database = database
         
-        if connection.is_connected():
-            print("✅ Conexión exitosa")
-            
-            # Verificar permisos (CORREGIDO: Agregado buffered=True)
-            cursor = connection.cursor(buffered=True)
-            
-            # Probar permisos básicos
-            try:
-                cursor.execute("SELECT 1")
-                # Consumir resultado por si acaso
-                cursor.fetchone()
-                print("✅ Permisos de SELECT - OK")
-            except Error:
-                print("❌ Sin permisos de SELECT")
-            
-            # Probar acceso a performance_schema
-            try:
-                cursor.execute("SELECT COUNT(*) FROM performance_schema.global_status LIMIT 1")
-                cursor.fetchone()
-                print("✅ Acceso a performance_schema - OK")
-            except Error:
-                print("⚠️ Sin acceso a performance_schema (monitoreo limitado)")
-            
-            # Probar acceso a information_schema
+        # connect() ya falla con Error si no hay conexión: no hace falta un ping adicional
+        print("✅ Conexión exitosa")
+        
+        # Verificar permisos (CORREGIDO: Agregado buffered=True)
+        cursor = connection.cursor(buffered=True)
+        
+        # Probar permisos básicos y acceso a los esquemas del sistema en un solo viaje
+        # (una conexión de MySQL atiende una sentencia a la vez: lanzarlas desde varios
+        # hilos sobre la misma conexión no las solaparía y no es seguro entre hilos)
+        passed = []
+        while len(passed) < len(_PERMISSION_CHECKS):
+            # El servidor detiene el script en la primera consulta fallida:
+            # se marca como fallida y se reenvían las siguientes
+            script = ";\n".join(query for query, _, _ in _PERMISSION_CHECKS[len(passed):])
             try:
-                cursor.execute("SELECT COUNT(*) FROM information_schema.tables LIMIT 1")
-                cursor.fetchone()
-                print("✅ Acceso a information_schema - OK")
+                for result in _iter_statement_results(cursor, script):
+                    result.fetchall()
+                    passed.append(True)
             except Error:
-                print("⚠️ Sin acceso a information_schema (reportes limitados)")
-            
-            cursor.close()
-            connection.close()
-            
-            return {
-                'host': host,
-                'port': port,
-                'username': username,
-                'password': password,
-                'database': database
-            }
-            
+                passed.append(False)
+        
+        for ok, (_, ok_message, error_message) in zip(passed, _PERMISSION_CHECKS):
+            print(ok_message if ok else error_message)
+        
+        cursor.close()
+        connection.close()
+        
+        return {
+            'host': host,
+            'port': port,
+            'username': username,
+            'password': password,
+            'database': database
+        }
+        
     except Error as e:
         print(f"❌ Error de conexión: {e}")
         return None
@@ -198,65 +337,49 @@ def create_env_file(db_config, email_config=None):
     """Crea el archivo .env con la configuración"""
     print("\n⚙️ Creando archivo de configuración...")
     
-    env_content = f"""# Configuración de Base de Datos
-DB_HOST={db_config['host']}
-DB_PORT={db_config['port']}
-DB_USER={db_config['username']}
-DB_PASSWORD={db_config['password']}
-DB_NAME={db_config['database']}
-DB_CHARSET=utf8mb4
-
-# Configuración de Automatización
-REPORTS_ENABLED=true
-REPORTS_SCHEDULE=daily
-REPORTS_OUTPUT_DIR=reports
-
-MONITORING_ENABLED=true
-MONITORING_INTERVAL=300
-
-BACKUP_ENABLED=true
-BACKUP_SCHEDULE=daily
-BACKUP_RETENTION_DAYS=30
-BACKUP_DIR=backups
-
-# Umbrales de Alertas
-ALERT_CPU_USAGE=80.0
-ALERT_MEMORY_USAGE=85.0
-ALERT_DISK_USAGE=90.0
-ALERT_CONNECTION_COUNT=100
-ALERT_SLOW_QUERY_TIME=5.0
-
-# Configuración de Logs
-LOG_LEVEL=INFO
-LOG_FILE=logs/sql_agent.log
-LOG_MAX_SIZE=10485760
-LOG_BACKUP_COUNT=5
-"""
-    
     if email_config:
-        env_content += f"""
-# Configuración de Email
-EMAIL_SMTP_SERVER={email_config['smtp_server']}
-EMAIL_SMTP_PORT={email_config['smtp_port']}
-EMAIL_USERNAME={email_config['username']}
-EMAIL_PASSWORD={email_config['password']}
-EMAIL_FROM={email_config['username']}
-EMAIL_TO={','.join(email_config['to_emails'])}
-"""
+        email_values = {
+            'EMAIL_STATUS': '',
+            'EMAIL_SMTP_SERVER': email_config['smtp_server'],
+            'EMAIL_SMTP_PORT': email_config['smtp_port'],
+            'EMAIL_USERNAME': email_config['username'],
+            'EMAIL_PASSWORD': email_config['password'],
+            'EMAIL_FROM': email_config['username'],
+            'EMAIL_TO': ','.join(email_config['to_emails'])
+        }
     else:
-        env_content += """
-# Configuración de Email (Deshabilitado)
-EMAIL_SMTP_SERVER=
-EMAIL_SMTP_PORT=587
-EMAIL_USERNAME=
-EMAIL_PASSWORD=
-EMAIL_FROM=
-EMAIL_TO=
-"""
+        email_values = {
+            'EMAIL_STATUS': ' (Deshabilitado)',
+            'EMAIL_SMTP_SERVER': '',
+            'EMAIL_SMTP_PORT': '587',
+            'EMAIL_USERNAME': '',
+            'EMAIL_PASSWORD': '',
+            'EMAIL_FROM': '',
+            'EMAIL_TO': ''
+        }
+    
+    # substitute() falla con KeyError si falta algún valor en lugar de escribir "None"
+    env_content = _ENV_TEMPLATE.substitute(
+        DB_HOST=db_config['host'],
+        DB_PORT=db_config['port'],
+        DB_USER=db_config['username'],
+        DB_PASSWORD=db_config['password'],
+        DB_NAME=db_config['database'],
+        **email_values
+    )
     
     try:
-        with open('.env', 'w') as f:
+        # Si la configuración no cambió se conserva el archivo (y su fecha de modificación)
+        if os.path.exists('.env'):
+            with open('.env') as f:
+                if f.read() == env_content:
+                    print("✅ Archivo .env sin cambios")
+                    return True
+        
+        # Escritura atómica: un fallo a mitad no deja un .env incompleto
+        with open('.env.tmp', 'w') as f:
             f.write(env_content)
+        os.replace('.env.tmp', '.env')
         print("✅ Archivo .env creado exitosamente")
         return True
     except Exception as e:
@@ -300,9 +423,13 @@ echo "👋 Agente detenido"
 """
     
     try:
-        with open('start_agent.sh', 'w') as f:
+        # Se crea ya ejecutable; si existía con otros permisos se ajustan sobre el
+        # mismo descriptor, sin volver a resolver la ruta
+        fd = os.open('start_agent.sh', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+        with os.fdopen(fd, 'w') as f:
+            if hasattr(os, 'fchmod'):
+                os.fchmod(fd, 0o755)
             f.write(startup_script)
-        os.chmod('start_agent.sh', 0o755)
         print("✅ Script start_agent.sh creado")
     except Exception as e:
         print(f"⚠️ Error creando start_agent.sh: {e}")
@@ -349,21 +476,24 @@ pause
     except Exception as e:
         print(f"⚠️ Error creando start_agent.bat: {e}")
 
-def run_initial_test():
-    """Ejecuta una prueba inicial del sistema"""
+def run_initial_test(connection_verified=False):
+    """Ejecuta una prueba inicial del sistema
+    
+    Con connection_verified=True (credenciales recién probadas en configure_database)
+    se omite la prueba de conexión y se pasa directamente a las métricas.
+    """
     print("\n🧪 Ejecutando prueba inicial...")
     
     try:
-        # Importar y probar componentes básicos
-        sys.path.append('.')
-        
+        # Importar y probar componentes básicos (el directorio de install.py ya está
+        # en sys.path al ejecutarlo como script)
         from config import db_config
         from database_manager import DatabaseManager
         
         # Probar gestor de base de datos
         db_manager = DatabaseManager(db_config)
         
-        if db_manager.test_connection():
+        if connection_verified or db_manager.test_connection():
             print("✅ Conexión a base de datos - OK")
             
             # Probar obtención de métricas
@@ -388,36 +518,8 @@ def run_initial_test():
 
 def show_completion_info():
     """Muestra información de finalización"""
-    print("\n🎉 ¡Instalación Completada!")
-    print("=" * 50)
-    
-    print("\n📋 Próximos pasos:")
-    print("1. Ejecutar el agente:")
-    print("   • Linux/macOS: ./start_agent.sh")
-    print("   • Windows: start_agent.bat")
-    print("   • Manual: python main.py --mode interactive")
-    
-    print("\n2. Acceder al dashboard web:")
-    print("   • Ejecutar: python examples/dashboard_launcher.py")
-    print("   • Abrir: http://localhost:5000")
-    
-    print("\n3. Generar reportes personalizados:")
-    print("   • Ejecutar: python examples/custom_reports.py")
-    
-    print("\n📁 Archivos importantes:")
-    print("   • .env - Configuración principal")
-    print("   • logs/sql_agent.log - Logs del sistema")
-    print("   • reports/ - Reportes generados")
-    print("   • backups/ - Backups automáticos")
-    
-    print("\n📖 Documentación:")
-    print("   • README.md - Documentación completa")
-    print("   • examples/ - Ejemplos de uso")
-    
-    print("\n🆘 Soporte:")
-    print("   • Revisa los logs en caso de problemas")
-    print("   • Verifica la configuración en .env")
-    print("   • Consulta README.md para más detalles")
+    # Texto fijo: una sola escritura en lugar de un print por línea
+    sys.stdout.write(_COMPLETION_MESSAGE)
 
 def main():
     """Función principal del instalador"""
@@ -455,7 +557,8 @@ def main():
     create_startup_scripts()
     
     # Prueba inicial
-    if not run_initial_test():
+    # configure_database() acaba de conectar con estas mismas credenciales
+    if not run_initial_test(connection_verified=True):
         print("⚠️ La prueba inicial falló, pero la instalación está completa")
         print("Revisa la configuración en .env")
     
@@ -7,9 +7,10 @@ import sys
 import os
 import argparse
 from datetime import datetime
+from functools import lru_cache
 import signal
-import json
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 
 # Configurar el path para importar módulos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -20,10 +21,31 @@ from report_generator import ReportGenerator
 from monitoring_system import MonitoringSystem
 from scheduler import TaskScheduler
 
+# Conexiones del pool en modo oneshot: una tarea suelta no necesita el pool completo
+_ONESHOT_POOL_SIZE = 2
+
+# Texto del menú interactivo
+_INTERACTIVE_MENU = """
+Opciones disponibles:
+1. 📊 Generar reporte de salud de base de datos
+2. 📈 Generar reporte de rendimiento
+3. 💾 Crear backup manual
+4. 🧹 Optimizar tablas
+5. 👁️ Ver estado del monitoreo
+6. 📋 Ver últimas alertas
+0. 🚪 Salir"""
+
+@lru_cache(maxsize=1)
+def _status_encoder():
+    """Codificador JSON del estado del monitoreo, creado una vez al primer uso"""
+    # json solo se usa para mostrar el estado: se importa aquí
+    import json
+    return json.JSONEncoder(indent=2, default=str)
+
 class SQLAutomationAgent:
     """Agente principal de automatización SQL"""
     
-    def __init__(self):
+    def __init__(self, pool_size: Optional[int] = None):
         self.setup_logging()
         self.logger = logging.getLogger(__name__)
         
@@ -33,19 +55,30 @@ class SQLAutomationAgent:
         self.monitoring_system = None
         self.scheduler = None
         
+        # Tamaño del pool de conexiones (None: el de la configuración)
+        self.pool_size = pool_size
+        
+        # Acciones del menú interactivo por opción
+        self._menu_handlers = {
+            '1': self._menu_health_report,
+            '2': self._menu_performance_report,
+            '3': self._menu_backup,
+            '4': self._menu_optimize,
+            '5': self._menu_monitoring_status,
+            '6': self._menu_active_alerts
+        }
+        
         # Estado del agente
         self.running = False
-        
-        # Configurar manejadores de señales
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        self._stop_event = threading.Event()
     
     def setup_logging(self):
         """Configura el sistema de logging"""
         log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        log_file = automation_config.log_file
         
         # CORRECCIÓN: Verificar si hay un directorio antes de intentar crearlo
-        log_dir = os.path.dirname(automation_config.log_file)
+        log_dir = os.path.dirname(log_file)
         if log_dir:
             os.makedirs(log_dir, exist_ok=True)
         
@@ -56,7 +89,7 @@ class SQLAutomationAgent:
             handlers=[
                 logging.StreamHandler(),
                 logging.handlers.RotatingFileHandler(
-                    automation_config.log_file,
+                    log_file,
                     maxBytes=automation_config.log_max_size,
                     backupCount=automation_config.log_backup_count
                 )
@@ -69,12 +102,14 @@ class SQLAutomationAgent:
         
         try:
             # 1. Conectar a base de datos
-            self.db_manager = DatabaseManager(db_config)
-            if not self.db_manager.test_connection():
+            self.db_manager = DatabaseManager(db_config, pool_size=self.pool_size)
+            # Una sola consulta valida la conexión y obtiene los datos del servidor
+            server_info = self.db_manager.get_server_info()
+            if server_info is None:
                 self.logger.error("No se pudo conectar a la base de datos")
                 return False
                 
-            self.logger.info("Conexión a base de datos establecida")
+            self.logger.info(f"Conexión a base de datos establecida (MySQL {server_info.get('version')})")
             
             # 2. Inicializar generador de reportes
             self.report_generator = ReportGenerator(self.db_manager)
@@ -97,8 +132,13 @@ class SQLAutomationAgent:
             return False
             
         self.running = True
+        self._stop_event.clear()
         self.logger.info("Agente iniciado correctamente")
         
+        # Configurar manejadores de señales: solo hacen falta con servicios en segundo plano
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        
         # Iniciar componentes activos
         if automation_config.monitoring_enabled:
             self.monitoring_system.start_monitoring()
@@ -112,6 +152,7 @@ class SQLAutomationAgent:
         """Detiene la ejecución del agente"""
         self.logger.info("Deteniendo agente...")
         self.running = False
+        self._stop_event.set()
         
         if self.monitoring_system:
             self.monitoring_system.stop_monitoring()
@@ -121,12 +162,16 @@ class SQLAutomationAgent:
             
         self.logger.info("Agente detenido")
     
+    def wait_until_stopped(self):
+        """Bloquea hasta que se detenga el agente, sin despertar periódicamente"""
+        self._stop_event.wait()
+    
     def _signal_handler(self, signum, frame):
         """Maneja señales de terminación (Ctrl+C)"""
         signal_name = signal.Signals(signum).name
         self.logger.info(f"Señal recibida: {signal_name}")
-        self.stop()
-        sys.exit(0)
+        # Solo despierta a wait_until_stopped(): main() hace la única llamada a stop()
+        self._stop_event.set()
         
     def run_interactive_mode(self):
         """Ejecuta el agente en modo interactivo (menú)"""
@@ -138,94 +183,98 @@ class SQLAutomationAgent:
         print("==========================================")
         
         while True:
-            print("\nOpciones disponibles:")
-            print("1. 📊 Generar reporte de salud de base de datos")
-            print("2. 📈 Generar reporte de rendimiento")
-            print("3. 💾 Crear backup manual")
-            print("4. 🧹 Optimizar tablas")
-            print("5. 👁️ Ver estado del monitoreo")
-            print("6. 📋 Ver últimas alertas")
-            print("0. 🚪 Salir")
+            print(_INTERACTIVE_MENU)
             
             choice = input("\nSelecciona una opción: ").strip()
             
-            if choice == '1':
-                print("\nGenerando reporte de salud...")
-                report_path = self.report_generator.generate_database_health_report()
-                if report_path:
-                    print(f"✅ Reporte generado: {report_path}")
-                else:
-                    print("❌ Error generando reporte")
-                    
-            elif choice == '2':
-                days = input("¿De cuántos días? (7): ").strip() or "7"
-                print(f"\nGenerando reporte de rendimiento ({days} días)...")
-                try:
-                    report_path = self.report_generator.generate_performance_report(int(days))
-                    if report_path:
-                        print(f"✅ Reporte generado: {report_path}")
-                    else:
-                        print("❌ Error generando reporte")
-                except ValueError:
-                    print("❌ Por favor ingresa un número válido")
-                    
-            elif choice == '3':
-                print("\nIniciando backup manual...")
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_path = os.path.join(
-                    automation_config.backup_dir, 
-                    f"manual_backup_{timestamp}.sql"
-                )
-                if self.db_manager.backup_database(backup_path):
-                    print(f"✅ Backup completado: {backup_path}")
-                else:
-                    print("❌ Error creando backup")
-                    
-            elif choice == '4':
-                print("\nOptimizando tablas...")
-                results = self.db_manager.optimize_tables()
-                print("\nResultados:")
-                for table, success in results.items():
-                    status = "✅" if success else "❌"
-                    print(f"{status} {table}")
-                    
-            elif choice == '5':
-                if self.monitoring_system:
-                    # Asegurar que el monitoreo esté activo para ver datos en tiempo real
-                    was_active = self.monitoring_system.monitoring_active
-                    if not was_active:
-                         print("Iniciando monitoreo temporal para obtener métricas...")
-                         self.monitoring_system.start_monitoring()
-                         import time
-                         time.sleep(2) # Esperar a que recolecte algo
-                    
-                    status = self.monitoring_system.get_monitoring_status()
-                    print("\nEstado del Monitoreo:")
-                    print(json.dumps(status, indent=2, default=str))
-                    
-                    if not was_active:
-                        self.monitoring_system.stop_monitoring()
-                else:
-                    print("Sistema de monitoreo no inicializado")
-                    
-            elif choice == '6':
-                if self.monitoring_system:
-                    alerts = self.monitoring_system.alert_manager.get_active_alerts()
-                    if alerts:
-                        print(f"\nAlertas Activas ({len(alerts)}):")
-                        for alert in alerts:
-                            print(f"[{alert.severity.upper()}] {alert.message} ({alert.timestamp})")
-                    else:
-                        print("\n✅ No hay alertas activas")
-                else:
-                    print("Sistema de monitoreo no inicializado")
-                    
-            elif choice == '0':
-                print("\n👋 ¡Hasta luego!")
-                self.stop()
-                break
+            # Varias opciones separadas por comas se ejecutan en orden (p. ej. "1,3")
+            for option in (option.strip() for option in choice.split(',')):
+                if option == '0':
+                    print("\n👋 ¡Hasta luego!")
+                    self.stop()
+                    return
+                self._menu_handlers.get(option, self._menu_invalid_option)()
+    
+    def _menu_health_report(self):
+        """Opción 1: genera el reporte de salud"""
+        print("\nGenerando reporte de salud...")
+        report_path = self.report_generator.generate_database_health_report()
+        if report_path:
+            print(f"✅ Reporte generado: {report_path}")
+        else:
+            print("❌ Error generando reporte")
+    
+    def _menu_performance_report(self):
+        """Opción 2: genera el reporte de rendimiento de los días indicados"""
+        days = input("¿De cuántos días? (7): ").strip() or "7"
+        print(f"\nGenerando reporte de rendimiento ({days} días)...")
+        try:
+            report_path = self.report_generator.generate_performance_report(int(days))
+            if report_path:
+                print(f"✅ Reporte generado: {report_path}")
+            else:
+                print("❌ Error generando reporte")
+        except ValueError:
+            print("❌ Por favor ingresa un número válido")
+    
+    def _menu_backup(self):
+        """Opción 3: crea un backup manual"""
+        print("\nIniciando backup manual...")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join(
+            automation_config.backup_dir, 
+            f"manual_backup_{timestamp}.sql.gz"
+        )
+        if self.db_manager.backup_database(backup_path):
+            print(f"✅ Backup completado: {backup_path}")
+        else:
+            print("❌ Error creando backup")
+    
+    def _menu_optimize(self):
+        """Opción 4: optimiza las tablas"""
+        print("\nOptimizando tablas...")
+        results = self.db_manager.optimize_tables()
+        # Una sola escritura para todas las tablas en lugar de un print por tabla
+        lines = ["\nResultados:"]
+        lines.extend(f"{'✅' if success else '❌'} {table}" for table, success in results.items())
+        sys.stdout.write("\n".join(lines) + "\n")
+    
+    def _menu_monitoring_status(self):
+        """Opción 5: muestra el estado del monitoreo"""
+        if self.monitoring_system:
+            # Asegurar que el monitoreo esté activo para ver datos en tiempo real
+            was_active = self.monitoring_system.monitoring_active
+            if not was_active:
+                 print("Iniciando monitoreo temporal para obtener métricas...")
+                 self.monitoring_system.start_monitoring()
+                 import time
+                 time.sleep(2) # Esperar a que recolecte algo
+            
+            status = self.monitoring_system.get_monitoring_status()
+            print("\nEstado del Monitoreo:")
+            print(_status_encoder().encode(status))
+            
+            if not was_active:
+                self.monitoring_system.stop_monitoring()
+        else:
+            print("Sistema de monitoreo no inicializado")
+    
+    def _menu_active_alerts(self):
+        """Opción 6: muestra las alertas activas"""
+        if self.monitoring_system:
+            alerts = self.monitoring_system.alert_manager.get_active_alerts()
+            if alerts:
+                print(f"\nAlertas Activas ({len(alerts)}):")
+                for alert in alerts:
+                    print(f"[{alert.severity.upper()}] {alert.message} ({alert.timestamp})")
             else:
-                print("❌ Opción no válida")
+                print("\n✅ No hay alertas activas")
+        else:
+            print("Sistema de monitoreo no inicializado")
+    
+    def _menu_invalid_option(self):
+        """Opción desconocida"""
+        print("❌ Opción no válida")
 
 def main():
     """Función principal de entrada"""
@@ -236,7 +285,7 @@ def main():
     
     args = parser.parse_args()
     
-    agent = SQLAutomationAgent()
+    agent = SQLAutomationAgent(pool_size=_ONESHOT_POOL_SIZE if args.mode == 'oneshot' else None)
     
     try:
         if args.mode == 'interactive':
@@ -244,10 +293,8 @@ def main():
         
         elif args.mode == 'daemon':
             if agent.start():
-                # Mantener el agente corriendo
-                import time
-                while agent.running:
-                    time.sleep(1)
+                # Mantener el agente corriendo hasta que se detenga (stop() o señal)
+                agent.wait_until_stopped()
             
         elif args.mode == 'oneshot':
             if args.task:
@@ -259,7 +306,7 @@ def main():
                         agent.report_generator.generate_performance_report(7)
                     elif args.task == 'backup':
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        backup_path = f"oneshot_backup_{timestamp}.sql"
+                        backup_path = f"oneshot_backup_{timestamp}.sql.gz"
                         agent.db_manager.backup_database(backup_path)
                     elif args.task == 'optimize':
                         agent.db_manager.optimize_tables()
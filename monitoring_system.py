@@ -1,24 +1,86 @@
 """
 Sistema de Monitoreo y Alertas para el Agente SQL
 """
+import sys
 import time
 import threading
+import queue
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from itertools import count, takewhile
+from operator import attrgetter
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Callable, Optional
+from typing import Dict, List, Any, Callable, Optional, Set
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from string import Template
 import json
-import os
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 
 from database_manager import DatabaseManager
 from config import automation_config, email_config
 
-@dataclass
+# Conexiones SMTP abiertas como máximo, mensajes por conexión y segundos sin uso
+# tras los que una conexión se cierra en lugar de reutilizarse
+_SMTP_MAX_CONNECTIONS = 2
+_SMTP_MAX_MESSAGES = 100
+_SMTP_IDLE_TIMEOUT = 100
+
+# Fallos de envío seguidos tras los que se deja de intentar, y segundos de espera
+_SMTP_FAILURE_LIMIT = 5
+_SMTP_RETRY_AFTER = 300
+
+# Muestras de métricas que se conservan en memoria
+_METRICS_HISTORY_SIZE = 1000
+
+# Ciclos de monitoreo entre lecturas del uso de disco (cambia despacio)
+_DISK_USAGE_REFRESH_CYCLES = 10
+
+# Métricas del sistema cuando no se pueden leer
+_EMPTY_SYSTEM_METRICS = {
+    'cpu_usage': 0,
+    'memory_usage': 0,
+    'disk_usage': 0
+}
+
+# Métricas de get_database_metrics(): (clave de origen, métrica, columna, conversión)
+_DB_METRIC_SPEC = (
+    ('connection_count', 'connection_count', 'Value', int),
+    ('uptime', 'uptime_hours', 'Value', lambda value: int(value) / 3600),
+    ('slow_queries', 'slow_queries_count', 'Value', int),
+    ('database_size', 'database_size_mb', 'size_mb', float),
+    ('queries_per_second', 'queries_per_second', 'Value', int),
+    ('table_locks', 'table_locks_waited', 'Value', int)
+)
+
+# Cuerpo de los emails de alerta
+_ALERT_EMAIL_TEMPLATE = Template("""Se ha generado una nueva alerta en el sistema de monitoreo SQL:
+
+Severidad: $severity
+Categoría: $category
+Métrica: $metric_name
+Valor actual: $current_value
+Umbral: $threshold_value
+Timestamp: $timestamp
+
+Mensaje: $message
+
+---
+Agente de Automatización SQL
+""")
+
+# Métricas comparadas con su umbral: (métrica, descripción, categoría de la alerta)
+_THRESHOLD_CHECKS = (
+    ('connection_count', 'Conexiones activas', 'connection'),
+    ('cpu_usage', 'Uso de CPU', 'performance'),
+    ('memory_usage', 'Uso de memoria', 'performance'),
+    ('disk_usage', 'Uso de disco', 'disk'),
+    ('slow_queries_count', 'Consultas lentas', 'query')
+)
+
+# slots=True solo existe a partir de Python 3.10; en versiones anteriores se omite
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class Alert:
     """Clase para representar una alerta"""
     id: str
@@ -32,6 +94,88 @@ class Alert:
     resolved: bool = False
     resolved_timestamp: Optional[datetime] = None
 
+class SMTPConnectionPool:
+    """Pool de conexiones SMTP ya autenticadas (STARTTLS + login) reutilizables entre envíos"""
+    
+    def __init__(self, smtp_server: str, smtp_port: int, username: str, password: str,
+                 max_connections: int = _SMTP_MAX_CONNECTIONS,
+                 max_messages: int = _SMTP_MAX_MESSAGES,
+                 idle_timeout: float = _SMTP_IDLE_TIMEOUT):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.username = username
+        self.password = password
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.logger = logging.getLogger(__name__)
+        
+        # Conexiones libres como (conexión, mensajes enviados, último uso)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+    
+    def _connect(self) -> "smtplib.SMTP":
+        """Abre y autentica una conexión nueva"""
+        # smtplib se importa con el primer envío: sin email configurado no se carga
+        import smtplib
+        
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        server.login(self.username, self.password)
+        return server
+    
+    def _discard(self, server: "smtplib.SMTP"):
+        """Cierra una conexión ignorando errores (puede estar ya cortada)"""
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def _checkout(self):
+        """Devuelve una conexión libre que siga viva, o una nueva, y sus mensajes enviados"""
+        import smtplib
+        
+        while True:
+            try:
+                server, messages_sent, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), 0
+            
+            if time.monotonic() - last_used > self.idle_timeout:
+                self._discard(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    return server, messages_sent
+            except smtplib.SMTPException:
+                pass
+            self._discard(server)
+    
+    @contextmanager
+    def acquire(self):
+        """Context manager que presta una conexión y la devuelve al pool al terminar"""
+        with self._slots:
+            server, messages_sent = self._checkout()
+            try:
+                yield server
+            except Exception:
+                self._discard(server)
+                raise
+            
+            messages_sent += 1
+            if messages_sent >= self.max_messages:
+                self._discard(server)
+            else:
+                self._idle.put((server, messages_sent, time.monotonic()))
+    
+    def close(self):
+        """Cierra todas las conexiones libres"""
+        while True:
+            try:
+                server, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
 class AlertManager:
     """Gestor de alertas y notificaciones"""
     
@@ -39,13 +183,43 @@ class AlertManager:
         self.email_config = email_config_obj or email_config
         self.logger = logging.getLogger(__name__)
         self.active_alerts: Dict[str, Alert] = {}
-        self.alert_history: List[Alert] = []
+        self._alert_ids = count(1)
+        # Historial acotado: al llenarse se descartan las alertas más antiguas
+        self.alert_history: deque = deque(maxlen=automation_config.alert_history_max or 10000)
+        
+        # Índice de alertas activas por métrica (ids), mantenido al crear y resolver
+        self.active_by_metric: Dict[str, Set[str]] = defaultdict(set)
+        
+        # El hilo de monitoreo crea y resuelve alertas mientras el dashboard las lee
+        self._lock = threading.RLock()
+        
+        # Lock por métrica para evaluar y crear o resolver su alerta sin carreras;
+        # métricas distintas no se bloquean entre sí
+        self._metric_locks: Dict[str, threading.RLock] = {}
+        
+        # Cabeceras fijas de los emails de alerta
+        self._email_from = self.email_config.from_email or self.email_config.username
+        self._email_to = ', '.join(self.email_config.to_emails)
+        
+        # Pool SMTP, creado con el primer email enviado
+        self._smtp_pool: Optional[SMTPConnectionPool] = None
+        
+        # Fallos de envío seguidos y momento (monótono) hasta el que no se reintenta
+        self._smtp_failures = 0
+        self._smtp_retry_at = 0.0
+        
+        # Los emails se envían desde un hilo propio para no frenar el monitoreo;
+        # el hilo se inicia con el primer email pendiente
+        self._mail_queue: "queue.Queue[Optional[Alert]]" = queue.Queue()
+        self._mail_thread: Optional[threading.Thread] = None
         
     def create_alert(self, category: str, metric_name: str, message: str, 
                     current_value: float, threshold_value: float, 
                     severity: str = 'medium') -> Alert:
         """Crea una nueva alerta"""
-        alert_id = f"{category}_{metric_name}_{int(time.time())}"
+        # Contador propio: con la hora en segundos dos alertas del mismo segundo
+        # compartían id y la segunda sustituía a la primera
+        alert_id = f"{category}_{metric_name}_{next(self._alert_ids)}"
         
         alert = Alert(
             id=alert_id,
@@ -58,34 +232,66 @@ class AlertManager:
             threshold_value=threshold_value
         )
         
-        self.active_alerts[alert_id] = alert
-        self.alert_history.append(alert)
+        # Orden de los locks: primero el de la métrica y después el general
+        with self.metric_lock(metric_name), self._lock:
+            self.active_alerts[alert_id] = alert
+            self.active_by_metric[metric_name].add(alert_id)
+            self.alert_history.append(alert)
         
         self.logger.warning(f"Nueva alerta [{severity.upper()}]: {message}")
         
-        # Enviar notificación por email si está configurado
+        # Encolar la notificación por email si está configurado
         if self.email_config.username and self.email_config.to_emails:
-            self._send_alert_email(alert)
+            self._queue_alert_email(alert)
         
         return alert
     
     def resolve_alert(self, alert_id: str) -> bool:
         """Resuelve una alerta activa"""
-        if alert_id in self.active_alerts:
-            alert = self.active_alerts[alert_id]
+        with self._lock:
+            alert = self.active_alerts.get(alert_id)
+        if alert is None:
+            return False
+        
+        with self.metric_lock(alert.metric_name), self._lock:
+            # Otro hilo pudo resolverla mientras se tomaba el lock de la métrica
+            if self.active_alerts.pop(alert_id, None) is None:
+                return False
+            
             alert.resolved = True
             alert.resolved_timestamp = datetime.now()
             
-            del self.active_alerts[alert_id]
-            
-            self.logger.info(f"Alerta resuelta: {alert.message}")
-            return True
+            alert_ids = self.active_by_metric.get(alert.metric_name)
+            if alert_ids is not None:
+                alert_ids.discard(alert_id)
+                if not alert_ids:
+                    del self.active_by_metric[alert.metric_name]
+        
+        self.logger.info(f"Alerta resuelta: {alert.message}")
+        return True
+    
+    def metric_lock(self, metric_name: str) -> threading.RLock:
+        """Devuelve el lock de una métrica, creándolo la primera vez
         
-        return False
+        create_alert y resolve_alert lo toman al modificar las alertas de la métrica;
+        quien lo mantiene puede comprobar si hay una alerta activa y crearla o
+        resolverla sin que otro hilo cambie la métrica entre medias.
+        """
+        lock = self._metric_locks.get(metric_name)
+        if lock is None:
+            with self._lock:
+                lock = self._metric_locks.setdefault(metric_name, threading.RLock())
+        return lock
+    
+    def get_metric_alert_ids(self, metric_name: str) -> List[str]:
+        """Devuelve los ids de las alertas activas de una métrica (copia del índice)"""
+        with self._lock:
+            return list(self.active_by_metric.get(metric_name, ()))
     
     def get_active_alerts(self, severity: Optional[str] = None) -> List[Alert]:
         """Obtiene alertas activas, opcionalmente filtradas por severidad"""
-        alerts = list(self.active_alerts.values())
+        with self._lock:
+            alerts = list(self.active_alerts.values())
         
         if severity:
             alerts = [a for a in alerts if a.severity == severity]
@@ -94,68 +300,95 @@ class AlertManager:
     
     def get_alert_summary(self) -> Dict[str, Any]:
         """Obtiene un resumen de alertas"""
-        active_alerts = list(self.active_alerts.values())
+        # Se trabaja sobre una copia tomada bajo el lock
+        with self._lock:
+            active_alerts = list(self.active_alerts.values())
+        
+        # Counter cuenta en C; las marcas de tiempo se recorren una vez para min y max
+        timestamps = [alert.timestamp for alert in active_alerts]
         
-        summary = {
+        return {
             'total_active': len(active_alerts),
-            'by_severity': {},
-            'by_category': {},
-            'oldest_alert': None,
-            'newest_alert': None
+            'by_severity': dict(Counter(map(attrgetter('severity'), active_alerts))),
+            'by_category': dict(Counter(map(attrgetter('category'), active_alerts))),
+            'oldest_alert': min(timestamps) if timestamps else None,
+            'newest_alert': max(timestamps) if timestamps else None
         }
-        
-        if active_alerts:
-            # Contar por severidad
-            for alert in active_alerts:
-                summary['by_severity'][alert.severity] = summary['by_severity'].get(alert.severity, 0) + 1
-                summary['by_category'][alert.category] = summary['by_category'].get(alert.category, 0) + 1
-            
-            # Alertas más antigua y más nueva
-            sorted_alerts = sorted(active_alerts, key=lambda x: x.timestamp)
-            summary['oldest_alert'] = sorted_alerts[0].timestamp
-            summary['newest_alert'] = sorted_alerts[-1].timestamp
-        
-        return summary
+    
+    def _queue_alert_email(self, alert: Alert):
+        """Deja la alerta en la cola de envío, iniciando el hilo de envío si hace falta"""
+        with self._lock:
+            if self._mail_thread is None or not self._mail_thread.is_alive():
+                self._mail_thread = threading.Thread(target=self._mail_worker, daemon=True)
+                self._mail_thread.start()
+            self._mail_queue.put(alert)
+    
+    def _mail_worker(self):
+        """Envía los emails encolados hasta recibir None"""
+        while True:
+            alert = self._mail_queue.get()
+            if alert is None:
+                break
+            self._send_alert_email(alert)
     
     def _send_alert_email(self, alert: Alert):
         """Envía notificación de alerta por email"""
+        # Con el servidor SMTP fallando seguido no se intenta hasta pasada la espera
+        if time.monotonic() < self._smtp_retry_at:
+            self.logger.debug(f"Envío por email suspendido, alerta no notificada: {alert.id}")
+            return
+        
+        from email.message import EmailMessage
+        
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_config.from_email or self.email_config.username
-            msg['To'] = ', '.join(self.email_config.to_emails)
+            msg = EmailMessage()
+            msg['From'] = self._email_from
+            msg['To'] = self._email_to
             msg['Subject'] = f"[SQL Agent Alert - {alert.severity.upper()}] {alert.category.title()}"
+            msg.set_content(_ALERT_EMAIL_TEMPLATE.substitute(
+                severity=alert.severity.upper(),
+                category=alert.category,
+                metric_name=alert.metric_name,
+                current_value=alert.current_value,
+                threshold_value=alert.threshold_value,
+                timestamp=alert.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                message=alert.message
+            ))
             
-            # Cuerpo del email
-            body = f"""
-            Se ha generado una nueva alerta en el sistema de monitoreo SQL:
-            
-            Severidad: {alert.severity.upper()}
-            Categoría: {alert.category}
-            Métrica: {alert.metric_name}
-            Valor actual: {alert.current_value}
-            Umbral: {alert.threshold_value}
-            Timestamp: {alert.timestamp.strftime('%Y-%m-%d %H:%M:%S')}
-            
-            Mensaje: {alert.message}
-            
-            ---
-            Agente de Automatización SQL
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Enviar email
-            server = smtplib.SMTP(self.email_config.smtp_server, self.email_config.smtp_port)
-            server.starttls()
-            server.login(self.email_config.username, self.email_config.password)
-            text = msg.as_string()
-            server.sendmail(self.email_config.username, self.email_config.to_emails, text)
-            server.quit()
+            # Enviar email reutilizando una conexión ya autenticada del pool
+            if self._smtp_pool is None:
+                self._smtp_pool = SMTPConnectionPool(
+                    self.email_config.smtp_server, self.email_config.smtp_port,
+                    self.email_config.username, self.email_config.password
+                )
+            with self._smtp_pool.acquire() as server:
+                server.send_message(msg, self.email_config.username, self.email_config.to_emails)
             
             self.logger.info(f"Notificación de alerta enviada por email: {alert.id}")
+            self._smtp_failures = 0
             
         except Exception as e:
             self.logger.error(f"Error enviando email de alerta: {e}")
+            
+            self._smtp_failures += 1
+            if self._smtp_failures >= _SMTP_FAILURE_LIMIT:
+                self._smtp_failures = 0
+                self._smtp_retry_at = time.monotonic() + _SMTP_RETRY_AFTER
+                self.logger.warning(
+                    f"{_SMTP_FAILURE_LIMIT} envíos fallidos seguidos, "
+                    f"se suspenden los emails durante {_SMTP_RETRY_AFTER} segundos"
+                )
+    
+    def close(self):
+        """Termina de enviar los emails pendientes y cierra las conexiones SMTP"""
+        with self._lock:
+            mail_thread, self._mail_thread = self._mail_thread, None
+        if mail_thread is not None and mail_thread.is_alive():
+            self._mail_queue.put(None)
+            mail_thread.join(timeout=30)
+        
+        if self._smtp_pool is not None:
+            self._smtp_pool.close()
 
 class MonitoringSystem:
     """Sistema principal de monitoreo"""
@@ -168,11 +401,35 @@ class MonitoringSystem:
         
         self.monitoring_active = False
         self.monitoring_thread = None
-        self.metrics_history: List[Dict[str, Any]] = []
+        # Las esperas del bucle se hacen sobre este evento para que stop_monitoring
+        # lo interrumpa al momento
+        self._stop_event = threading.Event()
+        # Búfer circular: al llenarse, cada muestra nueva descarta la más antigua
+        self.metrics_history: deque = deque(maxlen=_METRICS_HISTORY_SIZE)
         
         # Callbacks personalizados
         self.custom_checks: List[Callable] = []
         
+        # Último uso de disco leído y ciclos desde esa lectura
+        self._disk_usage: Optional[float] = None
+        self._disk_usage_cycles = 0
+        
+        # Verificaciones con umbral configurado, como (métrica, descripción, categoría,
+        # umbral); se reconstruyen cuando cambian los umbrales
+        self._active_checks: List[tuple] = []
+        self._active_checks_thresholds: Optional[Dict[str, float]] = None
+        
+        # psutil se importa una vez; si no está disponible las métricas del sistema van a 0.
+        # Primera lectura de CPU: las siguientes con interval=None devuelven al instante
+        # el uso medio desde la anterior en lugar de bloquear un segundo
+        self._psutil = None
+        try:
+            import psutil
+            psutil.cpu_percent(interval=None)
+            self._psutil = psutil
+        except Exception as e:
+            self.logger.warning(f"No se pudieron obtener métricas del sistema: {e}")
+        
     def add_custom_check(self, check_function: Callable):
         """Añade una función de verificación personalizada"""
         self.custom_checks.append(check_function)
@@ -185,6 +442,7 @@ class MonitoringSystem:
             return
         
         self.monitoring_active = True
+        self._stop_event.clear()
         self.monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.monitoring_thread.start()
         
@@ -193,39 +451,48 @@ class MonitoringSystem:
     def stop_monitoring(self):
         """Detiene el monitoreo"""
         self.monitoring_active = False
+        self._stop_event.set()
         
         if self.monitoring_thread and self.monitoring_thread.is_alive():
             self.monitoring_thread.join(timeout=5)
         
+        self.alert_manager.close()
         self.logger.info("Sistema de monitoreo detenido")
     
     def _monitoring_loop(self):
         """Bucle principal de monitoreo"""
-        while self.monitoring_active:
+        # Los ciclos se programan sobre el reloj monótono: el tiempo de cada ciclo no
+        # retrasa los siguientes ni les afectan los cambios de hora del sistema
+        next_cycle = time.monotonic()
+        
+        while not self._stop_event.is_set():
             try:
                 # Recopilar métricas
                 metrics = self._collect_metrics()
                 
                 if metrics:
-                    # Guardar en historial
+                    # Guardar en historial (la deque conserva solo las últimas muestras)
                     self.metrics_history.append(metrics)
                     
-                    # Mantener solo las últimas 1000 métricas
-                    if len(self.metrics_history) > 1000:
-                        self.metrics_history = self.metrics_history[-1000:]
-                    
                     # Verificar umbrales
                     self._check_thresholds(metrics)
                     
                     # Ejecutar verificaciones personalizadas
                     self._run_custom_checks(metrics)
                 
-                # Esperar antes del siguiente ciclo
-                time.sleep(self.config.monitoring_interval)
+                # Esperar hasta el siguiente ciclo; si el trabajo duró más que el
+                # intervalo se saltan los ciclos perdidos en lugar de encadenarlos
+                interval = self.config.monitoring_interval
+                next_cycle += interval
+                now = time.monotonic()
+                if next_cycle < now and interval > 0:
+                    next_cycle += ((now - next_cycle) // interval + 1) * interval
+                self._stop_event.wait(max(0, next_cycle - now))
                 
             except Exception as e:
                 self.logger.error(f"Error en bucle de monitoreo: {e}")
-                time.sleep(30)  # Esperar más tiempo en caso de error
+                self._stop_event.wait(30)  # Esperar más tiempo en caso de error
+                next_cycle = time.monotonic()
     
     def _collect_metrics(self) -> Optional[Dict[str, Any]]:
         """Recopila métricas de la base de datos"""
@@ -248,24 +515,10 @@ class MonitoringSystem:
             }
             
             # Extraer valores específicos
-            if db_metrics.get('connection_count'):
-                processed_metrics['connection_count'] = int(db_metrics['connection_count'][0]['Value'])
-            
-            if db_metrics.get('uptime'):
-                uptime_seconds = int(db_metrics['uptime'][0]['Value'])
-                processed_metrics['uptime_hours'] = uptime_seconds / 3600
-            
-            if db_metrics.get('slow_queries'):
-                processed_metrics['slow_queries_count'] = int(db_metrics['slow_queries'][0]['Value'])
-            
-            if db_metrics.get('database_size') and db_metrics['database_size']:
-                processed_metrics['database_size_mb'] = float(db_metrics['database_size'][0]['size_mb'])
-            
-            if db_metrics.get('queries_per_second'):
-                processed_metrics['queries_per_second'] = int(db_metrics['queries_per_second'][0]['Value'])
-            
-            if db_metrics.get('table_locks'):
-                processed_metrics['table_locks_waited'] = int(db_metrics['table_locks'][0]['Value'])
+            for source_key, metric_name, column, cast in _DB_METRIC_SPEC:
+                rows = db_metrics.get(source_key)
+                if rows:
+                    processed_metrics[metric_name] = cast(rows[0][column])
             
             # Métricas adicionales del sistema
             processed_metrics.update(self._get_system_metrics())
@@ -278,50 +531,52 @@ class MonitoringSystem:
     
     def _get_system_metrics(self) -> Dict[str, float]:
         """Obtiene métricas del sistema operativo"""
-        import psutil
+        psutil = self._psutil
+        if psutil is None:
+            return dict(_EMPTY_SYSTEM_METRICS)
         
         try:
+            if self._disk_usage is None or self._disk_usage_cycles >= _DISK_USAGE_REFRESH_CYCLES:
+                self._disk_usage = psutil.disk_usage('/').percent
+                self._disk_usage_cycles = 0
+            self._disk_usage_cycles += 1
+            
             return {
-                'cpu_usage': psutil.cpu_percent(interval=1),
+                'cpu_usage': psutil.cpu_percent(interval=None),
                 'memory_usage': psutil.virtual_memory().percent,
-                'disk_usage': psutil.disk_usage('/').percent
+                'disk_usage': self._disk_usage
             }
         except Exception as e:
             self.logger.warning(f"No se pudieron obtener métricas del sistema: {e}")
-            return {
-                'cpu_usage': 0,
-                'memory_usage': 0,
-                'disk_usage': 0
-            }
+            return dict(_EMPTY_SYSTEM_METRICS)
     
-    def _check_thresholds(self, metrics: Dict[str, Any]):
-        """Verifica si las métricas exceden los umbrales configurados"""
+    def _get_active_checks(self) -> List[tuple]:
+        """Devuelve las verificaciones con umbral, reconstruyéndolas si cambiaron los umbrales"""
         thresholds = self.config.alert_thresholds
         
+        if thresholds != self._active_checks_thresholds:
+            self._active_checks = [
+                (metric_name, description, category, thresholds[metric_name])
+                for metric_name, description, category in _THRESHOLD_CHECKS
+                if metric_name in thresholds
+            ]
+            self._active_checks_thresholds = dict(thresholds)
+        
+        return self._active_checks
+    
+    def _check_thresholds(self, metrics: Dict[str, Any]):
+        """Verifica si las métricas exceden los umbrales configurados"""
         # Verificar cada métrica contra su umbral
-        checks = [
-            ('connection_count', 'Conexiones activas', 'connection'),
-            ('cpu_usage', 'Uso de CPU', 'performance'),
-            ('memory_usage', 'Uso de memoria', 'performance'),
-            ('disk_usage', 'Uso de disco', 'disk'),
-            ('slow_queries_count', 'Consultas lentas', 'query')
-        ]
-        
-        for metric_name, description, category in checks:
-            if metric_name in metrics and metric_name in thresholds:
-                current_value = metrics[metric_name]
-                threshold = thresholds[metric_name]
-                
+        for metric_name, description, category, threshold in self._get_active_checks():
+            current_value = metrics.get(metric_name)
+            if current_value is None:
+                continue
+            
+            with self.alert_manager.metric_lock(metric_name):
                 # Verificar si excede el umbral
                 if current_value > threshold:
                     # Verificar si ya existe una alerta activa para esta métrica
-                    existing_alert = None
-                    for alert in self.alert_manager.active_alerts.values():
-                        if alert.metric_name == metric_name:
-                            existing_alert = alert
-                            break
-                    
-                    if not existing_alert:
+                    if not self.alert_manager.get_metric_alert_ids(metric_name):
                         # Determinar severidad
                         severity = self._determine_severity(current_value, threshold)
                         
@@ -337,13 +592,8 @@ class MonitoringSystem:
                         )
                 
                 else:
-                    # Verificar si hay alertas activas que se pueden resolver
-                    alerts_to_resolve = []
-                    for alert_id, alert in self.alert_manager.active_alerts.items():
-                        if alert.metric_name == metric_name:
-                            alerts_to_resolve.append(alert_id)
-                    
-                    for alert_id in alerts_to_resolve:
+                    # Resolver las alertas activas de esta métrica
+                    for alert_id in self.alert_manager.get_metric_alert_ids(metric_name):
                         self.alert_manager.resolve_alert(alert_id)
     
     def _determine_severity(self, current_value: float, threshold: float) -> str:
@@ -371,10 +621,18 @@ class MonitoringSystem:
         """Obtiene el historial de métricas de las últimas N horas"""
         cutoff_time = datetime.now() - timedelta(hours=hours_back)
         
-        return [
-            metrics for metrics in self.metrics_history
-            if metrics['timestamp'] >= cutoff_time
-        ]
+        # Copia previa: iterar la deque mientras el hilo de monitoreo añade muestras
+        # lanzaría RuntimeError (list() la copia sin soltar el GIL)
+        history = list(self.metrics_history)
+        
+        # Las muestras están en orden cronológico: se recorren desde la más reciente
+        # y se para en la primera anterior al corte
+        recent = list(takewhile(
+            lambda metrics: metrics['timestamp'] >= cutoff_time,
+            reversed(history)
+        ))
+        recent.reverse()
+        return recent
     
     def get_monitoring_status(self) -> Dict[str, Any]:
         """Obtiene el estado actual del sistema de monitoreo"""
@@ -388,22 +646,26 @@ class MonitoringSystem:
         }
     
     def export_metrics(self, filepath: str, hours_back: int = 24):
-        """Exporta métricas a un archivo JSON"""
+        """Exporta métricas a un archivo JSON
+        
+        Usa orjson si está instalado. Los timestamps se serializan directamente en
+        formato ISO, sin copiar cada muestra del historial.
+        """
         metrics_data = {
             'export_timestamp': datetime.now().isoformat(),
             'hours_back': hours_back,
-            'metrics': []
+            'metrics': self.get_metrics_history(hours_back)
         }
         
-        # Convertir timestamps a strings para JSON
-        for metrics in self.get_metrics_history(hours_back):
-            metrics_copy = metrics.copy()
-            metrics_copy['timestamp'] = metrics_copy['timestamp'].isoformat()
-            metrics_data['metrics'].append(metrics_copy)
-        
         try:
-            with open(filepath, 'w') as f:
-                json.dump(metrics_data, f, indent=2)
+            try:
+                import orjson
+            except ImportError:
+                with open(filepath, 'w') as f:
+                    json.dump(metrics_data, f, indent=2, default=_json_default)
+            else:
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(metrics_data, option=orjson.OPT_INDENT_2))
             
             self.logger.info(f"Métricas exportadas a: {filepath}")
             return True
@@ -412,6 +674,12 @@ class MonitoringSystem:
             self.logger.error(f"Error exportando métricas: {e}")
             return False
 
+def _json_default(value):
+    """Serializa para json los tipos que no admite por defecto (timestamps)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 # Funciones de verificación personalizadas de ejemplo
 def check_database_growth(metrics: Dict[str, Any], alert_manager: AlertManager):
     """Verificación personalizada: crecimiento rápido de la base de datos"""
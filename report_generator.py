@@ -2,22 +2,236 @@
 Generador de Reportes Automáticos para el Agente SQL
 """
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime
+from decimal import Decimal
 import os
-import json
-from typing import Dict, List, Any, Optional
+import re
+from typing import Dict, List, Any, Optional, Callable
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from jinja2 import Template
+from jinja2 import DictLoader, Environment
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
 
 from database_manager import DatabaseManager
 from config import automation_config
 
+# Filas máximas que se muestran como tabla en los reportes personalizados
+_TABLE_MAX_ROWS = 50
+
+# Tipo de pandas para columnas de texto respaldadas por Arrow (requiere pyarrow)
+try:
+    import pyarrow
+    _ARROW_STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _ARROW_STRING_DTYPE = None
+
+# Filas máximas de un resultado para dibujar su gráfico automático
+_CHART_MAX_ROWS = 20
+
+# ORDER BY final con una sola columna descendente (y LIMIT opcional): consultas paginables
+_KEYSET_ORDER_RE = re.compile(r'\bORDER\s+BY\s+(\w+)\s+DESC\s*(?:LIMIT\s+\d+\s*)?;?\s*$', re.IGNORECASE)
+
+# Caracteres que se eliminan del nombre de un reporte para usarlo en el nombre del archivo
+_UNSAFE_NAME_CHARS_RE = re.compile(r'[^\w \-]')
+
+# Consultas simultáneas como máximo (por debajo del tamaño del pool de conexiones)
+_MAX_QUERY_WORKERS = 4
+
+# Plantillas HTML de los reportes: una base común y una por tipo de reporte
+_HTML_BASE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ report_title }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { text-align: center; margin-bottom: 30px; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 8px; }
+        .metric-card { background: #f8f9fa; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #007bff; }
+        .chart-container { margin: 20px 0; padding: 15px; background: white; border-radius: 5px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); }
+        .recommendations { background: #d4edda; border: 1px solid #c3e6cb; padding: 15px; border-radius: 5px; margin: 20px 0; }
+        .slow-query { background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; margin: 5px 0; border-radius: 3px; font-family: monospace; font-size: 12px; }
+        table { width: 100%; border-collapse: collapse; margin: 10px 0; }
+        th, td { padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }
+        th { background-color: #f2f2f2; }
+        .timestamp { color: #666; font-size: 14px; }
+    </style>
+    {% if charts %}
+    <script src="{{ plotly_js_url }}"></script>
+    {% endif %}
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{{ report_title }}</h1>
+            <p class="timestamp">Generado: {{ timestamp }}</p>
+            <p>Base de datos: {{ database_name }}</p>
+        </div>
+
+        {% block content %}{% endblock %}
+
+        <!-- Gráficos -->
+        {% if charts %}
+        <h2>Visualizaciones</h2>
+        {% for chart_name, chart_html in charts.items() %}
+        <div class="chart-container">
+            <h3>{{ chart_name.replace('_', ' ').title() }}</h3>
+            {{ chart_html|safe }}
+        </div>
+        {% endfor %}
+        {% endif %}
+
+        <div style="margin-top: 40px; text-align: center; color: #666; font-size: 12px;">
+            <p>Generado por Agente de Automatización SQL - {{ timestamp }}</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_HTML_HEALTH_TEMPLATE = """{% extends 'base' %}
+{% block content %}
+<h2>Métricas de Salud</h2>
+{% for key, value in metrics.items() %}
+<div class="metric-card">
+    <strong>{{ key.replace('_', ' ').title() }}:</strong> {{ value }}
+</div>
+{% endfor %}
+
+{% if recommendations %}
+<div class="recommendations">
+    <h3>Recomendaciones</h3>
+    <ul>
+    {% for rec in recommendations %}
+        <li>{{ rec }}</li>
+    {% endfor %}
+    </ul>
+</div>
+{% endif %}
+
+{% if slow_queries %}
+<h2>Consultas Lentas (Top 10)</h2>
+{% for query in slow_queries[:10] %}
+<div class="slow-query">
+    <strong>Tiempo promedio:</strong> {{ "%.3f"|format(query.avg_time_seconds) }}s<br>
+    <strong>Consulta:</strong> {{ query.sql_text[:200] }}{% if query.sql_text|length > 200 %}...{% endif %}
+</div>
+{% endfor %}
+{% endif %}
+{% endblock %}
+"""
+
+_HTML_PERFORMANCE_TEMPLATE = """{% extends 'base' %}
+{% block content %}
+<h2>Resumen de Rendimiento ({{ period_days }} días)</h2>
+
+{% if query_performance %}
+<h3>Rendimiento por Día</h3>
+<table>
+    <tr><th>Fecha</th><th>Consultas</th><th>Tiempo Promedio (s)</th><th>Filas Examinadas</th></tr>
+    {% for row in query_performance %}
+    <tr>
+        <td>{{ row.date }}</td>
+        <td>{{ row.query_count }}</td>
+        <td>{{ "%.3f"|format(row.avg_execution_time) }}</td>
+        <td>{{ row.total_rows_examined }}</td>
+    </tr>
+    {% endfor %}
+</table>
+{% endif %}
+
+{% if table_usage %}
+<h3>Uso de Tablas</h3>
+<table>
+    <tr><th>Tabla</th><th>Filas</th><th>Tamaño Total (MB)</th><th>Datos (MB)</th><th>Índices (MB)</th></tr>
+    {% for table in table_usage[:15] %}
+    <tr>
+        <td>{{ table.table_name }}</td>
+        <td>{{ table.table_rows }}</td>
+        <td>{{ table.size_mb }}</td>
+        <td>{{ table.data_mb }}</td>
+        <td>{{ table.index_mb }}</td>
+    </tr>
+    {% endfor %}
+</table>
+{% endif %}
+{% endblock %}
+"""
+
+_HTML_CUSTOM_TEMPLATE = """{% extends 'base' %}
+{% block content %}
+<h2>Reporte: {{ report_name }}</h2>
+
+{% for query_name, result in results.items() %}
+    {% if not query_name.endswith('_summary') %}
+    <h3>{{ query_name.replace('_', ' ').title() }}</h3>
+
+    {% if result %}
+        {% set row_count = results.get(query_name ~ '_summary', {}).get('row_count', result|length) %}
+        {% if row_count <= 50 %}
+        <table>
+            <tr>
+            {% for key in result[0].keys() %}
+                <th>{{ key }}</th>
+            {% endfor %}
+            </tr>
+            {% for row in result %}
+            <tr>
+            {% for value in row.values() %}
+                <td>{{ value }}</td>
+            {% endfor %}
+            </tr>
+            {% endfor %}
+        </table>
+        {% else %}
+        <p>Resultado con {{ row_count }} filas (demasiadas para mostrar en tabla)</p>
+        {% endif %}
+    {% else %}
+        <p>Sin resultados</p>
+    {% endif %}
+    {% endif %}
+{% endfor %}
+{% endblock %}
+"""
+
+# Entorno Jinja2 con las plantillas compiladas una sola vez al importar el módulo
+_TEMPLATE_ENV = Environment(
+    loader=DictLoader({
+        'base': _HTML_BASE_TEMPLATE,
+        'database_health': _HTML_HEALTH_TEMPLATE,
+        'performance': _HTML_PERFORMANCE_TEMPLATE,
+        'custom': _HTML_CUSTOM_TEMPLATE
+    }),
+    autoescape=True,
+    cache_size=-1
+)
+# plotly.js se incluye una sola vez en la cabecera, con la versión que usa la librería
+_TEMPLATE_ENV.globals['plotly_js_url'] = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+_REPORT_TEMPLATES = {
+    report_type: _TEMPLATE_ENV.get_template(report_type)
+    for report_type in ('database_health', 'performance', 'custom')
+}
+
+def _native_value(value: Any) -> Any:
+    """Convierte un valor de pandas/numpy en el equivalente nativo de Python (NULL como None)"""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        value = value.item()
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
 class ReportGenerator:
     """Generador de reportes automáticos con visualizaciones"""
     
@@ -26,46 +240,42 @@ class ReportGenerator:
         self.config = automation_config
         self.logger = logging.getLogger(__name__)
         
-        # Configurar estilo de gráficos
-        plt.style.use('seaborn-v0_8')
-        sns.set_palette("husl")
-        
         # Crear directorio de reportes
         os.makedirs(self.config.reports_output_dir, exist_ok=True)
     
     def generate_database_health_report(self) -> Dict[str, Any]:
         """Genera reporte de salud de la base de datos"""
         self.logger.info("Generando reporte de salud de base de datos")
+        # Un único instante para el timestamp del reporte y el nombre del archivo
+        now = datetime.now()
         
-        # Obtener métricas
-        metrics = self.db_manager.get_database_metrics()
-        slow_queries = self.db_manager.get_slow_queries(20)
+        # Obtener métricas y consultas lentas con una sola conexión
+        snapshot = self.db_manager.collect_monitoring_snapshot(slow_queries_limit=20)
+        metrics = snapshot['metrics']
+        slow_queries = snapshot['slow_queries']
         
-        # Procesar métricas
+        # Procesar métricas (una vez, se reutilizan para las recomendaciones)
+        processed_metrics = self._process_metrics(metrics)
         report_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'database_name': self.db_manager.config.database,
-            'metrics': self._process_metrics(metrics),
+            'metrics': processed_metrics,
             'slow_queries': slow_queries,
-            'recommendations': self._generate_recommendations(metrics, slow_queries)
+            'recommendations': self._generate_recommendations(processed_metrics, slow_queries)
         }
         
         # Generar visualizaciones
         charts = self._create_health_charts(report_data)
         report_data['charts'] = charts
         
-        # Generar HTML
-        html_report = self._generate_html_report(report_data, 'database_health')
-        
-        # Guardar reporte
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Guardar reporte (el HTML se escribe directamente en el archivo)
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         report_path = os.path.join(
             self.config.reports_output_dir, 
             f"database_health_{timestamp}.html"
         )
         
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html_report)
+        self._write_html_report(report_data, 'database_health', report_path)
         
         self.logger.info(f"Reporte de salud guardado: {report_path}")
         return report_data
@@ -73,10 +283,14 @@ class ReportGenerator:
     def generate_performance_report(self, days_back: int = 7) -> Dict[str, Any]:
         """Genera reporte de rendimiento de los últimos N días"""
         self.logger.info(f"Generando reporte de rendimiento ({days_back} días)")
+        # Un único instante para el timestamp del reporte y el nombre del archivo
+        now = datetime.now()
         
-        # Consultas de rendimiento
+        database = self.db_manager.config.database
+        
+        # Consultas de rendimiento como (sql, parámetros)
         performance_queries = {
-            'query_performance': """
+            'query_performance': ("""
                 SELECT 
                     DATE(last_seen) as date,
                     COUNT(*) as query_count,
@@ -88,8 +302,8 @@ class ReportGenerator:
                 AND last_seen >= DATE_SUB(NOW(), INTERVAL %s DAY)
                 GROUP BY DATE(last_seen)
                 ORDER BY date DESC
-            """,
-            'table_usage': f"""
+            """, (database, days_back)),
+            'table_usage': ("""
                 SELECT 
                     table_name,
                     table_rows,
@@ -97,99 +311,144 @@ class ReportGenerator:
                     ROUND((data_length / 1024 / 1024), 2) AS data_mb,
                     ROUND((index_length / 1024 / 1024), 2) AS index_mb
                 FROM information_schema.tables 
-                WHERE table_schema = '{self.db_manager.config.database}'
+                WHERE table_schema = %s
                 ORDER BY size_mb DESC
                 LIMIT 20
-            """
+            """, (database,))
         }
         
         report_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'period_days': days_back,
-            'database_name': self.db_manager.config.database
+            'database_name': database
         }
         
-        # Ejecutar consultas
-        for key, query in performance_queries.items():
-            try:
-                if key == 'query_performance':
-                    result = self.db_manager.execute_query(
-                        query, (self.db_manager.config.database, days_back)
-                    )
-                else:
-                    result = self.db_manager.execute_query(query)
-                report_data[key] = result
-            except Exception as e:
-                self.logger.error(f"Error en consulta {key}: {e}")
-                report_data[key] = []
+        # Ejecutar las consultas a la vez, cada una con su propia conexión del pool,
+        # como sentencias preparadas (los parámetros no se interpolan en el SQL)
+        results = self._run_each(
+            performance_queries,
+            lambda query_sql, params: self.db_manager.execute_query(query_sql, params, prepared=True),
+            parallel=True
+        )
+        for key, result in results.items():
+            if isinstance(result, Exception):
+                self.logger.error(f"Error en consulta {key}: {result}")
+                result = []
+            report_data[key] = result
         
         # Generar gráficos
         charts = self._create_performance_charts(report_data)
         report_data['charts'] = charts
         
-        # Generar HTML
-        html_report = self._generate_html_report(report_data, 'performance')
-        
-        # Guardar reporte
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Guardar reporte (el HTML se escribe directamente en el archivo)
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         report_path = os.path.join(
             self.config.reports_output_dir, 
             f"performance_report_{timestamp}.html"
         )
         
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html_report)
+        self._write_html_report(report_data, 'performance', report_path)
         
         self.logger.info(f"Reporte de rendimiento guardado: {report_path}")
         return report_data
     
-    def generate_custom_report(self, queries: Dict[str, str], report_name: str) -> Dict[str, Any]:
-        """Genera un reporte personalizado basado en consultas definidas por el usuario"""
+    def generate_custom_report(self, queries: Dict[str, Any], report_name: str,
+                               cache_ttl: Optional[float] = None,
+                               prepared: bool = False,
+                               stream: bool = False,
+                               parallel: bool = False,
+                               page_size: Optional[int] = None,
+                               cursor: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Genera un reporte personalizado basado en consultas definidas por el usuario
+        
+        Cada consulta puede ser el texto SQL o una tupla (sql, parámetros).
+        cache_ttl (segundos) permite reutilizar resultados recientes de las mismas consultas.
+        Con prepared=True cada consulta se ejecuta como sentencia preparada reutilizable
+        (útil para reportes que se regeneran a menudo) en lugar de en un único lote.
+        Con stream=True los resultados se leen por bloques directamente a DataFrames y
+        en 'results' solo se guardan las filas que se muestran en la tabla del reporte.
+        Con prepared o stream, parallel=True lanza las consultas a la vez, cada una
+        con su propia conexión del pool.
+        Con page_size las consultas ordenadas por una sola columna descendente se
+        paginan por clave (keyset): cursor es {consulta: 'next_cursor' del resumen de
+        esa consulta en la página anterior}.
+        """
         self.logger.info(f"Generando reporte personalizado: {report_name}")
+        # Un único instante para el timestamp del reporte y el nombre del archivo
+        now = datetime.now()
+        
+        sort_keys: Dict[str, str] = {}
+        if page_size:
+            queries, sort_keys = self._paginate_queries(queries, page_size, cursor or {})
         
         report_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'report_name': report_name,
             'database_name': self.db_manager.config.database,
             'results': {}
         }
         
-        # Ejecutar consultas personalizadas
-        for query_name, query_sql in queries.items():
+        if stream:
+            query_results = self._run_each(queries, self._fetch_dataframe, parallel)
+        elif prepared:
+            query_results = self._run_each(
+                queries,
+                lambda query_sql, params: self.db_manager.execute_query(
+                    query_sql, params, cache_ttl=cache_ttl, prepared=True
+                ),
+                parallel
+            )
+        else:
+            # Ejecutar todas las consultas personalizadas en un solo viaje al servidor
+            query_results = self.db_manager.execute_multi(queries, cache_ttl=cache_ttl)
+        frames: Dict[str, pd.DataFrame] = {}
+        
+        for query_name, result in query_results.items():
             try:
-                result = self.db_manager.execute_query(query_sql)
-                report_data['results'][query_name] = result
+                if isinstance(result, Exception):
+                    raise result
+                
+                if query_name in sort_keys:
+                    result, next_cursor = self._keyset_page(
+                        result, sort_keys[query_name], page_size, (cursor or {}).get(query_name)
+                    )
+                
+                if isinstance(result, pd.DataFrame):
+                    df = frames[query_name] = result
+                    report_data['results'][query_name] = df.head(_TABLE_MAX_ROWS).to_dict('records')
+                else:
+                    report_data['results'][query_name] = result
+                    # Crear DataFrame para análisis (se reutiliza para los gráficos)
+                    df = frames[query_name] = self._to_dataframe(result) if result else None
                 
-                # Crear DataFrame para análisis
-                if result:
-                    df = pd.DataFrame(result)
+                if df is not None and not df.empty:
+                    numeric = df.select_dtypes(include=['number'])
                     report_data['results'][f"{query_name}_summary"] = {
                         'row_count': len(df),
                         'columns': list(df.columns),
-                        'data_types': df.dtypes.to_dict() if not df.empty else {}
+                        'data_types': df.dtypes.to_dict() if not df.empty else {},
+                        'numeric_summary': self._summarize_numeric(numeric)
                     }
+                    if query_name in sort_keys:
+                        report_data['results'][f"{query_name}_summary"]['next_cursor'] = next_cursor
                 
             except Exception as e:
                 self.logger.error(f"Error en consulta personalizada {query_name}: {e}")
                 report_data['results'][query_name] = []
         
         # Generar visualizaciones automáticas
-        charts = self._create_custom_charts(report_data)
+        charts = self._create_custom_charts(report_data, frames)
         report_data['charts'] = charts
         
-        # Generar HTML
-        html_report = self._generate_html_report(report_data, 'custom')
-        
-        # Guardar reporte
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_name = "".join(c for c in report_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        # Guardar reporte (el HTML se escribe directamente en el archivo)
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        safe_name = _UNSAFE_NAME_CHARS_RE.sub('', report_name).rstrip()
         report_path = os.path.join(
             self.config.reports_output_dir, 
             f"custom_{safe_name}_{timestamp}.html"
         )
         
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html_report)
+        self._write_html_report(report_data, 'custom', report_path)
         
         self.logger.info(f"Reporte personalizado guardado: {report_path}")
         return report_data
@@ -219,16 +478,15 @@ class ReportGenerator:
         
         return processed
     
-    def _generate_recommendations(self, metrics: Dict[str, Any], slow_queries: List[Dict]) -> List[str]:
-        """Genera recomendaciones basadas en las métricas"""
+    def _generate_recommendations(self, processed_metrics: Dict[str, Any],
+                                  slow_queries: List[Dict]) -> List[str]:
+        """Genera recomendaciones basadas en las métricas ya procesadas (_process_metrics)"""
         recommendations = []
         
         # Analizar conexiones
-        processed = self._process_metrics(metrics)
-        
-        if processed.get('connections', 0) > self.config.alert_thresholds['connection_count']:
+        if processed_metrics.get('connections', 0) > self.config.alert_thresholds['connection_count']:
             recommendations.append(
-                f"Alto número de conexiones activas ({processed['connections']}). "
+                f"Alto número de conexiones activas ({processed_metrics['connections']}). "
                 "Considere optimizar el pool de conexiones."
             )
         
@@ -240,9 +498,9 @@ class ReportGenerator:
             )
         
         # Analizar tamaño de base de datos
-        if processed.get('database_size_mb', 0) > 1000:  # > 1GB
+        if processed_metrics.get('database_size_mb', 0) > 1000:  # > 1GB
             recommendations.append(
-                f"Base de datos grande ({processed['database_size_mb']:.2f} MB). "
+                f"Base de datos grande ({processed_metrics['database_size_mb']:.2f} MB). "
                 "Considere implementar archivado de datos históricos."
             )
         
@@ -258,18 +516,23 @@ class ReportGenerator:
         try:
             # Gráfico de consultas lentas
             if report_data['slow_queries']:
-                df_slow = pd.DataFrame(report_data['slow_queries'])
+                # Trazas directamente desde las filas, sin pasar por un DataFrame
+                top_slow = report_data['slow_queries'][:10]
                 
-                fig = px.bar(
-                    df_slow.head(10), 
-                    x='avg_time_seconds', 
-                    y='sql_text',
-                    orientation='h',
+                fig = go.Figure(data=[
+                    go.Bar(
+                        x=[row['avg_time_seconds'] for row in top_slow],
+                        y=[row['sql_text'] for row in top_slow],
+                        orientation='h'
+                    )
+                ])
+                fig.update_layout(
                     title='Top 10 Consultas Más Lentas',
-                    labels={'avg_time_seconds': 'Tiempo Promedio (segundos)', 'sql_text': 'Consulta SQL'}
+                    height=600,
+                    xaxis={'title': 'Tiempo Promedio (segundos)'},
+                    yaxis={'title': 'Consulta SQL', 'categoryorder': 'total ascending'}
                 )
-                fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
-                charts['slow_queries'] = pio.to_html(fig, include_plotlyjs='cdn')
+                charts['slow_queries'] = pio.to_html(fig, include_plotlyjs=False, full_html=False)
             
             # Gráfico de métricas generales
             metrics = report_data['metrics']
@@ -291,7 +554,7 @@ class ReportGenerator:
                         xaxis_title='Métrica',
                         yaxis_title='Valor'
                     )
-                    charts['general_metrics'] = pio.to_html(fig, include_plotlyjs='cdn')
+                    charts['general_metrics'] = pio.to_html(fig, include_plotlyjs=False, full_html=False)
         
         except Exception as e:
             self.logger.error(f"Error creando gráficos de salud: {e}")
@@ -305,231 +568,292 @@ class ReportGenerator:
         try:
             # Gráfico de rendimiento por día
             if report_data.get('query_performance'):
-                df_perf = pd.DataFrame(report_data['query_performance'])
+                rows = report_data['query_performance']
+                dates = [row['date'] for row in rows]
                 
-                if not df_perf.empty:
-                    fig = make_subplots(
-                        rows=2, cols=1,
-                        subplot_titles=('Número de Consultas por Día', 'Tiempo Promedio de Ejecución'),
-                        vertical_spacing=0.1
-                    )
-                    
-                    # Gráfico de cantidad de consultas
-                    fig.add_trace(
-                        go.Scatter(x=df_perf['date'], y=df_perf['query_count'], 
-                                 mode='lines+markers', name='Consultas'),
-                        row=1, col=1
-                    )
-                    
-                    # Gráfico de tiempo de ejecución
-                    fig.add_trace(
-                        go.Scatter(x=df_perf['date'], y=df_perf['avg_execution_time'], 
-                                 mode='lines+markers', name='Tiempo Avg (s)', line_color='red'),
-                        row=2, col=1
-                    )
-                    
-                    fig.update_layout(height=600, title_text="Rendimiento de Consultas")
-                    charts['query_performance'] = pio.to_html(fig, include_plotlyjs='cdn')
+                fig = make_subplots(
+                    rows=2, cols=1,
+                    subplot_titles=('Número de Consultas por Día', 'Tiempo Promedio de Ejecución'),
+                    vertical_spacing=0.1
+                )
+                
+                # Gráfico de cantidad de consultas
+                fig.add_trace(
+                    go.Scatter(x=dates, y=[row['query_count'] for row in rows], 
+                             mode='lines+markers', name='Consultas'),
+                    row=1, col=1
+                )
+                
+                # Gráfico de tiempo de ejecución
+                fig.add_trace(
+                    go.Scatter(x=dates, y=[row['avg_execution_time'] for row in rows], 
+                             mode='lines+markers', name='Tiempo Avg (s)', line_color='red'),
+                    row=2, col=1
+                )
+                
+                fig.update_layout(height=600, title_text="Rendimiento de Consultas")
+                charts['query_performance'] = pio.to_html(fig, include_plotlyjs=False, full_html=False)
             
             # Gráfico de uso de tablas
             if report_data.get('table_usage'):
-                df_tables = pd.DataFrame(report_data['table_usage'])
+                top_tables = report_data['table_usage'][:15]
                 
-                if not df_tables.empty:
-                    fig = px.bar(
-                        df_tables.head(15), 
-                        x='table_name', 
-                        y='size_mb',
-                        title='Top 15 Tablas por Tamaño',
-                        labels={'size_mb': 'Tamaño (MB)', 'table_name': 'Tabla'}
+                fig = go.Figure(data=[
+                    go.Bar(
+                        x=[row['table_name'] for row in top_tables],
+                        y=[row['size_mb'] for row in top_tables]
                     )
-                    fig.update_layout(xaxis_tickangle=-45)
-                    charts['table_usage'] = pio.to_html(fig, include_plotlyjs='cdn')
+                ])
+                fig.update_layout(
+                    title='Top 15 Tablas por Tamaño',
+                    xaxis={'title': 'Tabla', 'tickangle': -45},
+                    yaxis={'title': 'Tamaño (MB)'}
+                )
+                charts['table_usage'] = pio.to_html(fig, include_plotlyjs=False, full_html=False)
         
         except Exception as e:
             self.logger.error(f"Error creando gráficos de rendimiento: {e}")
         
         return charts
     
-    def _create_custom_charts(self, report_data: Dict[str, Any]) -> Dict[str, str]:
+    def _paginate_queries(self, queries: Dict[str, Any], page_size: int,
+                          cursor: Dict[str, Any]) -> tuple:
+        """Reescribe las consultas paginables como una página por clave (keyset)
+        
+        La consulta original (sin su ORDER BY/LIMIT) pasa a ser una tabla derivada
+        filtrada por la clave de orden, así el servidor solo devuelve una página a
+        partir del cursor. La clave no tiene por qué ser única: el filtro es
+        `clave <= valor` y se piden además tantas filas como ya se devolvieron con
+        ese valor, que luego descarta _keyset_page. Así ninguna fila empatada con la
+        última de la página anterior se pierde ni se repite.
+        Devuelve (consultas, {consulta: columna de orden}).
+        """
+        paginated, sort_keys = {}, {}
+        for name, query in queries.items():
+            query_sql, params = query if isinstance(query, tuple) else (query, None)
+            match = _KEYSET_ORDER_RE.search(query_sql)
+            if not match:
+                paginated[name] = query
+                continue
+            
+            key = sort_keys[name] = match.group(1)
+            named = isinstance(params, dict)
+            values = dict(params) if named else list(params or ())
+            
+            def placeholder(param_name, value):
+                if named:
+                    values[param_name] = value
+                    return f"%({param_name})s"
+                values.append(value)
+                return "%s"
+            
+            where = ""
+            cursor_value, seen_rows = self._split_cursor(cursor.get(name))
+            if cursor_value is not None:
+                where = f" WHERE `{key}` <= {placeholder('_keyset_cursor', cursor_value)}"
+            limit = placeholder('_keyset_page_size', int(page_size) + len(seen_rows))
+            paginated[name] = (
+                f"SELECT * FROM ({query_sql[:match.start()].rstrip()}) AS pagina"
+                f"{where} ORDER BY `{key}` DESC LIMIT {limit}",
+                values if named else tuple(values)
+            )
+        return paginated, sort_keys
+    
+    def _split_cursor(self, cursor: Any) -> tuple:
+        """Separa un cursor en (valor de la clave, filas ya devueltas con ese valor)
+        
+        Acepta también un valor suelto (sin filas vistas): las filas empatadas con
+        él se devuelven de nuevo, pero ninguna se pierde.
+        """
+        if isinstance(cursor, dict):
+            return cursor.get('value'), [tuple(row) for row in cursor.get('seen', ())]
+        return cursor, []
+    
+    def _keyset_page(self, result: Any, key: str, page_size: int,
+                     cursor: Any) -> tuple:
+        """Quita de una página keyset las filas ya devueltas y calcula el siguiente cursor
+        
+        result es la lista de filas (dict) o el DataFrame devuelto por la consulta de
+        _paginate_queries. Devuelve (página, next_cursor); next_cursor es None cuando
+        no quedan más filas y si no {'value': clave, 'seen': filas con esa clave}.
+        """
+        cursor_value, seen_rows = self._split_cursor(cursor)
+        pending = Counter(seen_rows)
+        
+        is_frame = isinstance(result, pd.DataFrame)
+        if is_frame:
+            rows = [tuple(map(_native_value, row)) for row in result.itertuples(index=False, name=None)]
+            key_index = list(result.columns).index(key)
+        else:
+            rows = [tuple(row.values()) for row in result]
+            key_index = list(result[0]).index(key) if result else 0
+        
+        # Descartar (por contenido) las filas ya devueltas en páginas anteriores
+        keep = []
+        for position, row in enumerate(rows):
+            if pending[row] > 0:
+                pending[row] -= 1
+            else:
+                keep.append(position)
+        keep = keep[:page_size]
+        
+        page = result.iloc[keep].reset_index(drop=True) if is_frame else [result[i] for i in keep]
+        
+        # El servidor devolvió todas las filas pedidas: puede haber más
+        next_cursor = None
+        if keep and len(rows) == page_size + len(seen_rows):
+            last_value = rows[keep[-1]][key_index]
+            seen = [list(rows[i]) for i in keep if rows[i][key_index] == last_value]
+            if last_value == cursor_value:
+                # Toda la página empata con el cursor anterior: se acumulan sus filas
+                seen = [list(row) for row in seen_rows] + seen
+            next_cursor = {'value': last_value, 'seen': seen}
+        
+        return page, next_cursor
+    
+    def _run_each(self, queries: Dict[str, Any], run_query: Callable[[str, Any], Any],
+                  parallel: bool = False) -> Dict[str, Any]:
+        """Ejecuta run_query(sql, parámetros) por cada consulta; los errores quedan como excepción
+        
+        Con parallel=True las consultas se reparten entre hilos, cada uno con su
+        propia conexión del pool, y el tiempo total es el de la más lenta.
+        """
+        def run(query):
+            query_sql, params = query if isinstance(query, tuple) else (query, None)
+            try:
+                return run_query(query_sql, params)
+            except Exception as e:
+                return e
+        
+        if parallel and len(queries) > 1:
+            with ThreadPoolExecutor(max_workers=min(_MAX_QUERY_WORKERS, len(queries))) as executor:
+                futures = {name: executor.submit(run, query) for name, query in queries.items()}
+                return {name: future.result() for name, future in futures.items()}
+        
+        return {name: run(query) for name, query in queries.items()}
+    
+    def _fetch_dataframe(self, query_sql: str, params: Any = None) -> pd.DataFrame:
+        """Lee una consulta por bloques y la devuelve como un único DataFrame"""
+        chunks = [
+            self._to_dataframe(rows, columns)
+            for columns, rows in self.db_manager.iter_query_chunks(query_sql, params)
+        ]
+        if not chunks:
+            return pd.DataFrame()
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _summarize_numeric(self, numeric: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+        """Suma, media, mínimo y máximo de cada columna numérica (ignorando NULL)"""
+        if numeric.empty:
+            return {}
+        
+        # Una sola matriz float64 y reducciones por eje sobre todas las columnas a la vez,
+        # en lugar de una llamada de pandas por columna y agregado
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        sums = np.where(present, values, 0.0).sum(axis=0)
+        counts = present.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        # fmin/fmax ignoran NaN sin avisos; una columna solo con NULL queda como NaN
+        mins = np.fmin.reduce(values, axis=0)
+        maxs = np.fmax.reduce(values, axis=0)
+        
+        return {
+            column: {
+                'sum': float(sums[i]),
+                'mean': float(means[i]),
+                'min': float(mins[i]),
+                'max': float(maxs[i])
+            }
+            for i, column in enumerate(numeric.columns)
+        }
+    
+    def _to_dataframe(self, rows: List, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Construye un DataFrame con las columnas DECIMAL convertidas a float"""
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        
+        # mysql-connector devuelve DECIMAL como objetos Decimal (dtype object):
+        # convertirlos a float64 permite agregarlos de forma vectorizada.
+        # Los textos pasan a cadenas de Arrow (si pyarrow está instalado), que ocupan
+        # bastante menos que un objeto str de Python por valor. Solo se convierten las
+        # columnas en las que todos los valores no nulos son del mismo tipo
+        for col in df.columns[df.dtypes == object]:
+            inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+            if inferred == 'decimal':
+                df[col] = df[col].astype(float)
+            elif _ARROW_STRING_DTYPE and inferred == 'string':
+                df[col] = df[col].astype(_ARROW_STRING_DTYPE)
+        
+        return df
+    
+    def _create_custom_charts(self, report_data: Dict[str, Any],
+                              frames: Optional[Dict[str, pd.DataFrame]] = None) -> Dict[str, str]:
         """Crea gráficos automáticos para reportes personalizados"""
         charts = {}
+        frames = frames or {}
         
         try:
-            for query_name, result in report_data['results'].items():
-                if isinstance(result, list) and result and not query_name.endswith('_summary'):
-                    df = pd.DataFrame(result)
-                    
-                    # Detectar columnas numéricas
+            results = report_data['results']
+            # Solo los resultados de las consultas, sin sus entradas '_summary'
+            query_names = [name for name in results if not name.endswith('_summary')]
+            
+            for query_name in query_names:
+                result = results[query_name]
+                if not isinstance(result, list) or not result:
+                    continue
+                
+                # Solo para datasets pequeños (se comprueba antes de construir nada)
+                row_count = results.get(f"{query_name}_summary", {}).get('row_count', len(result))
+                if row_count > _CHART_MAX_ROWS:
+                    continue
+                
+                # Detectar columnas numéricas: con el DataFrame ya construido por sus
+                # tipos, si no por los valores de la primera fila
+                df = frames.get(query_name)
+                if df is not None:
                     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                    
-                    if len(numeric_cols) >= 1:
-                        # Crear gráfico de barras simple
-                        if len(df) <= 20:  # Solo para datasets pequeños
-                            x_col = df.columns[0]  # Primera columna como X
-                            y_col = numeric_cols[0]  # Primera columna numérica como Y
-                            
-                            fig = px.bar(
-                                df, 
-                                x=x_col, 
-                                y=y_col,
-                                title=f'Visualización: {query_name.replace("_", " ").title()}'
-                            )
-                            fig.update_layout(xaxis_tickangle=-45)
-                            charts[query_name] = pio.to_html(fig, include_plotlyjs='cdn')
+                    x_col = df.columns[0]
+                else:
+                    sample = result[0]
+                    numeric_cols = [
+                        key for key, value in sample.items()
+                        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+                    ]
+                    x_col = next(iter(sample))
+                
+                if not numeric_cols:
+                    continue
+                
+                # Crear gráfico de barras simple: primera columna como X y
+                # primera columna numérica como Y
+                y_col = numeric_cols[0]
+                if df is None:
+                    # Solo las dos columnas que se dibujan
+                    df = self._to_dataframe(result, list(dict.fromkeys((x_col, y_col))))
+                
+                fig = px.bar(
+                    df, 
+                    x=x_col, 
+                    y=y_col,
+                    title=f'Visualización: {query_name.replace("_", " ").title()}'
+                )
+                fig.update_layout(xaxis_tickangle=-45)
+                charts[query_name] = pio.to_html(fig, include_plotlyjs=False, full_html=False)
         
         except Exception as e:
             self.logger.error(f"Error creando gráficos personalizados: {e}")
         
         return charts
     
-    def _generate_html_report(self, report_data: Dict[str, Any], report_type: str) -> str:
-        """Genera el HTML del reporte usando templates"""
-        
-        html_template = """
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{{ report_title }}</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
-                .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-                .header { text-align: center; margin-bottom: 30px; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 8px; }
-                .metric-card { background: #f8f9fa; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #007bff; }
-                .chart-container { margin: 20px 0; padding: 15px; background: white; border-radius: 5px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); }
-                .recommendations { background: #d4edda; border: 1px solid #c3e6cb; padding: 15px; border-radius: 5px; margin: 20px 0; }
-                .slow-query { background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; margin: 5px 0; border-radius: 3px; font-family: monospace; font-size: 12px; }
-                table { width: 100%; border-collapse: collapse; margin: 10px 0; }
-                th, td { padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }
-                th { background-color: #f2f2f2; }
-                .timestamp { color: #666; font-size: 14px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>{{ report_title }}</h1>
-                    <p class="timestamp">Generado: {{ timestamp }}</p>
-                    <p>Base de datos: {{ database_name }}</p>
-                </div>
-                
-                {% if report_type == 'database_health' %}
-                    <h2>Métricas de Salud</h2>
-                    {% for key, value in metrics.items() %}
-                    <div class="metric-card">
-                        <strong>{{ key.replace('_', ' ').title() }}:</strong> {{ value }}
-                    </div>
-                    {% endfor %}
-                    
-                    {% if recommendations %}
-                    <div class="recommendations">
-                        <h3>Recomendaciones</h3>
-                        <ul>
-                        {% for rec in recommendations %}
-                            <li>{{ rec }}</li>
-                        {% endfor %}
-                        </ul>
-                    </div>
-                    {% endif %}
-                    
-                    {% if slow_queries %}
-                    <h2>Consultas Lentas (Top 10)</h2>
-                    {% for query in slow_queries[:10] %}
-                    <div class="slow-query">
-                        <strong>Tiempo promedio:</strong> {{ "%.3f"|format(query.avg_time_seconds) }}s<br>
-                        <strong>Consulta:</strong> {{ query.sql_text[:200] }}{% if query.sql_text|length > 200 %}...{% endif %}
-                    </div>
-                    {% endfor %}
-                    {% endif %}
-                
-                {% elif report_type == 'performance' %}
-                    <h2>Resumen de Rendimiento ({{ period_days }} días)</h2>
-                    
-                    {% if query_performance %}
-                    <h3>Rendimiento por Día</h3>
-                    <table>
-                        <tr><th>Fecha</th><th>Consultas</th><th>Tiempo Promedio (s)</th><th>Filas Examinadas</th></tr>
-                        {% for row in query_performance %}
-                        <tr>
-                            <td>{{ row.date }}</td>
-                            <td>{{ row.query_count }}</td>
-                            <td>{{ "%.3f"|format(row.avg_execution_time) }}</td>
-                            <td>{{ row.total_rows_examined }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                    {% endif %}
-                    
-                    {% if table_usage %}
-                    <h3>Uso de Tablas</h3>
-                    <table>
-                        <tr><th>Tabla</th><th>Filas</th><th>Tamaño Total (MB)</th><th>Datos (MB)</th><th>Índices (MB)</th></tr>
-                        {% for table in table_usage[:15] %}
-                        <tr>
-                            <td>{{ table.table_name }}</td>
-                            <td>{{ table.table_rows }}</td>
-                            <td>{{ table.size_mb }}</td>
-                            <td>{{ table.data_mb }}</td>
-                            <td>{{ table.index_mb }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                    {% endif %}
-                
-                {% elif report_type == 'custom' %}
-                    <h2>Reporte: {{ report_name }}</h2>
-                    
-                    {% for query_name, result in results.items() %}
-                        {% if not query_name.endswith('_summary') %}
-                        <h3>{{ query_name.replace('_', ' ').title() }}</h3>
-                        
-                        {% if result %}
-                            {% if result|length <= 50 %}
-                            <table>
-                                <tr>
-                                {% for key in result[0].keys() %}
-                                    <th>{{ key }}</th>
-                                {% endfor %}
-                                </tr>
-                                {% for row in result %}
-                                <tr>
-                                {% for value in row.values() %}
-                                    <td>{{ value }}</td>
-                                {% endfor %}
-                                </tr>
-                                {% endfor %}
-                            </table>
-                            {% else %}
-                            <p>Resultado con {{ result|length }} filas (demasiadas para mostrar en tabla)</p>
-                            {% endif %}
-                        {% else %}
-                            <p>Sin resultados</p>
-                        {% endif %}
-                        {% endif %}
-                    {% endfor %}
-                {% endif %}
-                
-                <!-- Gráficos -->
-                {% if charts %}
-                <h2>Visualizaciones</h2>
-                {% for chart_name, chart_html in charts.items() %}
-                <div class="chart-container">
-                    <h3>{{ chart_name.replace('_', ' ').title() }}</h3>
-                    {{ chart_html|safe }}
-                </div>
-                {% endfor %}
-                {% endif %}
-                
-                <div style="margin-top: 40px; text-align: center; color: #666; font-size: 12px;">
-                    <p>Generado por Agente de Automatización SQL - {{ timestamp }}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+    def _write_html_report(self, report_data: Dict[str, Any], report_type: str, report_path: str):
+        """Genera el HTML del reporte usando templates y lo escribe en report_path
         
+        La plantilla se renderiza por fragmentos directamente al archivo, sin construir
+        antes el HTML completo en memoria (los gráficos pueden ocupar varios MB).
+        """
         # Configurar datos del template
         template_data = report_data.copy()
         
@@ -542,9 +866,8 @@ class ReportGenerator:
         
         template_data['report_type'] = report_type
         
-        # Renderizar template
-        template = Template(html_template)
-        return template.render(**template_data)
+        # Renderizar la plantilla ya compilada del tipo de reporte
+        _REPORT_TEMPLATES[report_type].stream(**template_data).dump(report_path, encoding='utf-8')
     
     def schedule_reports(self):
         """Programa la generación automática de reportes"""
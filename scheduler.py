@@ -363,7 +363,7 @@ class TaskScheduler:
         """Realiza backup de la base de datos"""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"backup_{self.db_manager.config.database}_{timestamp}.sql"
+            backup_filename = f"backup_{self.db_manager.config.database}_{timestamp}.sql.gz"
             backup_path = os.path.join(self.config.backup_dir, backup_filename)
             
             # Crear directorio si no existe
@@ -0,0 +1,107 @@
+-- Tablas de resumen (vistas materializadas) para los reportes de ejemplo
+-- de examples/custom_reports.py.
+--
+-- MySQL no tiene vistas materializadas nativas: cada mv_* es una tabla
+-- agregada por día que DatabaseManager.refresh_materialized_views() mantiene
+-- con REPLACE INTO ... SELECT a partir de la marca guardada en mv_refresh_log.
+-- El propio refresco ejecuta este archivo para crear las tablas que falten,
+-- y su primera ejecución las rellena por completo.
+
+-- Marca de la última actualización de cada vista
+CREATE TABLE IF NOT EXISTS mv_refresh_log (
+    view_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    last_refresh DATETIME NOT NULL
+);
+
+-- Ventas agregadas por día (ventas_diarias, tendencia_mensual)
+CREATE TABLE IF NOT EXISTS mv_ventas_diarias (
+    fecha DATE NOT NULL PRIMARY KEY,
+    num_ventas INT UNSIGNED NOT NULL,
+    total_ventas DECIMAL(18, 2) NOT NULL
+);
+
+-- Registros de usuarios por día y origen (registros_nuevos)
+CREATE TABLE IF NOT EXISTS mv_registros_diarios (
+    fecha DATE NOT NULL PRIMARY KEY,
+    nuevos_registros INT UNSIGNED NOT NULL,
+    desde_web INT UNSIGNED NOT NULL,
+    desde_mobile INT UNSIGNED NOT NULL,
+    desde_api INT UNSIGNED NOT NULL
+);
+
+-- Movimientos de inventario por día y tipo (movimientos_inventario)
+CREATE TABLE IF NOT EXISTS mv_movimientos_diarios (
+    fecha DATE NOT NULL,
+    tipo_movimiento VARCHAR(32) NOT NULL,
+    num_movimientos INT UNSIGNED NOT NULL,
+    cantidad_total DECIMAL(18, 2) NOT NULL,
+    valor_total DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (fecha, tipo_movimiento)
+);
+
+-- Ingresos y gastos por día (ingresos_mensuales, flujo_caja_diario)
+CREATE TABLE IF NOT EXISTS mv_flujo_caja_diario (
+    fecha DATE NOT NULL PRIMARY KEY,
+    ingresos DECIMAL(18, 2) NOT NULL,
+    gastos DECIMAL(18, 2) NOT NULL,
+    neto DECIMAL(18, 2) NOT NULL
+);
+
+-- Gastos por día y categoría (gastos_por_categoria)
+CREATE TABLE IF NOT EXISTS mv_gastos_categoria_diarios (
+    fecha DATE NOT NULL,
+    categoria VARCHAR(64) NOT NULL,
+    num_transacciones INT UNSIGNED NOT NULL,
+    total_gastado DECIMAL(18, 2) NOT NULL,
+    gasto_minimo DECIMAL(18, 2) NOT NULL,
+    gasto_maximo DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (fecha, categoria)
+);
+
+-- Ventas ya unidas con producto y vendedor (productos_mas_vendidos,
+-- ventas_por_vendedor y el análisis por categoría). producto_id y vendedor_id
+-- quedan a NULL cuando la venta no tiene producto o vendedor asociado.
+CREATE TABLE IF NOT EXISTS mv_ventas_enriquecidas (
+    venta_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+    fecha_venta DATETIME NOT NULL,
+    total DECIMAL(18, 2) NOT NULL,
+    producto_id BIGINT UNSIGNED NULL,
+    producto_nombre VARCHAR(255) NULL,
+    categoria VARCHAR(64) NULL,
+    vendedor_id BIGINT UNSIGNED NULL,
+    vendedor_nombre VARCHAR(255) NULL,
+    departamento VARCHAR(64) NULL,
+    KEY idx_fecha_venta (fecha_venta),
+    KEY idx_producto_fecha (producto_id, fecha_venta),
+    KEY idx_vendedor_fecha (vendedor_id, fecha_venta)
+);
+
+-- Productos con su inventario y últimos movimientos (productos_sin_movimiento,
+-- rotacion_inventario)
+CREATE TABLE IF NOT EXISTS mv_productos_inventario (
+    producto_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+    codigo VARCHAR(64) NOT NULL,
+    nombre VARCHAR(255) NOT NULL,
+    categoria VARCHAR(64) NULL,
+    precio_unitario DECIMAL(18, 2) NOT NULL,
+    fecha_creacion DATETIME NULL,
+    cantidad_actual INT NOT NULL,
+    ultimo_movimiento DATETIME NULL,
+    ultima_salida DATETIME NULL,
+    KEY idx_categoria (categoria),
+    KEY idx_ultimo_movimiento (ultimo_movimiento)
+);
+
+-- Ventas por producto y mes (consulta de ejemplo con funciones de ventana).
+-- Se alimenta de mv_ventas_enriquecidas, que debe refrescarse antes.
+CREATE TABLE IF NOT EXISTS mv_ventas_prod_cat_mes (
+    anio SMALLINT UNSIGNED NOT NULL,
+    mes TINYINT UNSIGNED NOT NULL,
+    producto_id BIGINT UNSIGNED NOT NULL,
+    categoria VARCHAR(64) NULL,
+    producto VARCHAR(255) NULL,
+    unidades INT UNSIGNED NOT NULL,
+    ingresos DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (anio, mes, producto_id),
+    KEY idx_categoria_mes (categoria, anio, mes)
+);
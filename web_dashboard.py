@@ -15,6 +15,9 @@ from scheduler import TaskScheduler
 from report_generator import ReportGenerator
 from config import automation_config
 
+# Hilos del servidor WSGI: las peticiones del dashboard esperan sobre todo a MySQL
+_DEFAULT_SERVER_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
 class WebDashboard:
     """Dashboard web para monitoreo y control del agente"""
     
@@ -690,7 +693,7 @@ class WebDashboard:
         """Realiza un backup manual"""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"manual_backup_{timestamp}.sql"
+            backup_filename = f"manual_backup_{timestamp}.sql.gz"
             backup_path = os.path.join(automation_config.backup_dir, backup_filename)
             
             os.makedirs(automation_config.backup_dir, exist_ok=True)
@@ -738,7 +741,25 @@ class WebDashboard:
             self.logger.error(f"Error descargando archivo {filename}: {e}")
             return jsonify({'error': str(e)}), 500
     
-    def run(self, host='0.0.0.0', port=5000, debug=False):
-        """Ejecuta el servidor web del dashboard"""
+    def run(self, host='0.0.0.0', port=5000, debug=False, threads=None):
+        """Ejecuta el servidor web del dashboard
+        
+        Fuera de debug usa waitress (si está instalado), un servidor WSGI de producción
+        que atiende las peticiones con un grupo de hilos fijo. Todos los hilos comparten
+        el mismo agente (pool de conexiones, cachés y programador), a diferencia de
+        varios procesos worker que duplicarían las tareas programadas. Los hilos se
+        limitan al tamaño del pool, que falla al instante cuando no quedan conexiones.
+        """
         self.logger.info(f"Iniciando dashboard web en http://{host}:{port}")
+        
+        if not debug:
+            try:
+                from waitress import serve
+            except ImportError:
+                self.logger.warning("waitress no está instalado, se usa el servidor de desarrollo de Flask")
+            else:
+                threads = min(threads or _DEFAULT_SERVER_THREADS, self.db_manager.pool_size)
+                serve(self.app, host=host, port=port, threads=threads)
+                return
+        
         self.app.run(host=host, port=port, debug=debug, threaded=True)
\ No newline at end of file